@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Appointment, UserPayment, Establishment
+from .models import Customer, Appointment, UserPayment, Establishment, OutboundEmail, StripeEvent
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -13,10 +13,23 @@ class AppoinmentAdmin(admin.ModelAdmin):
 
 @admin.register(UserPayment)
 class UserPaymentAdmin(admin.ModelAdmin):
-    list_display = "customer", "appointment", "has_paid",
+    list_display = "customer", "appointment", "has_paid", "checkout_status",
+    list_filter = "checkout_status",
     ordering = "-created_at",
 
 @admin.register(Establishment)
 class EstablishmentAdmin(admin.ModelAdmin):
     list_display = "name", "city", "cnpj",
-    orderin = "created_at",
\ No newline at end of file
+    orderin = "created_at",
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = "subject", "status", "attempts", "next_attempt_at",
+    list_filter = "status",
+    ordering = "-created_at",
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = "event_id", "type", "status", "attempts",
+    list_filter = "status", "type",
+    ordering = "-created_at",
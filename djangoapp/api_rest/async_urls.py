@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views
+
+# Mounted before api_rest.urls by project/urls_async.py, so these paths win under ASGI
+app_name = 'api_rest_async'
+
+urlpatterns = [
+    path('payments/checkout/<int:pk>/', async_views.AsyncCreateCheckoutSession.as_view(), name='checkout'),
+    path('payments/checkout/status/<uuid:token>/', async_views.AsyncCheckoutSessionStatus.as_view(), name='checkout_status'),
+    path('establishment/stripe/connect/', async_views.AsyncEstablishmentStripeConnect.as_view(), name='establishment_connect_stripe'),
+    path('stripe/connect/refresh/', async_views.AsyncStripeConnectRefresh.as_view(), name='connect_refresh'),
+    path('stripe/connect/return/', async_views.AsyncStripeConnectReturn.as_view(), name='connect_return'),
+]
@@ -0,0 +1,162 @@
+"""Async versions of the endpoints that spend their time waiting on Stripe.
+
+DRF 3.14 cannot await a handler, so these are plain Django async views that keep
+the API contract of their APIView twins in views.py: JWT authentication, JSON
+bodies rendered by FastJSONRenderer and errors shaped like DRF's exception
+handler. Under ASGI (project/urls_async.py) one worker keeps hundreds of Stripe
+calls in flight; under WSGI the sync views are served instead.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import Appointment, Establishment, UserPayment
+from .renderers import FastJSONRenderer
+from .serializers import CheckoutStatusQuerySerializer
+from .services import checkout_sessions, stripe_connect, stripe_gateway
+from .services.establishments import get_user_establishment
+
+User = get_user_model()
+
+
+async def authenticate(request):
+    """The active user of the request's Bearer token, looked up with the async ORM.
+
+    Raises NotAuthenticated without a token and AuthenticationFailed (or simplejwt's
+    InvalidToken) for a bad one, like JWTAuthentication does for DRF views.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise NotAuthenticated()
+
+    validated_token = authentication.get_validated_token(raw_token)
+    user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+    user = await User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None or not user.is_active:
+        raise AuthenticationFailed("Usuário não encontrado ou inativo", code="user_not_found")
+    return user
+
+
+async def onboarding_establishment(request):
+    token = request.GET.get("state")
+    establishment = await Establishment.objects.filter(stripe_onboarding_token=token).afirst() if token else None
+    if establishment is None:
+        raise Http404
+    return establishment
+
+
+class AsyncAPIView(View):
+    authenticated = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authentication only, like APIView: no CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if self.authenticated:
+                request.user = await authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return self.respond({"detail": NotFound.default_detail}, status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = self.respond(data, exc.status_code)
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                response["WWW-Authenticate"] = 'Bearer realm="api"'
+            return response
+
+    def respond(self, data, status_code=status.HTTP_200_OK, headers=None):
+        return HttpResponse(FastJSONRenderer().render(data), status=status_code,
+                            content_type="application/json", headers=headers)
+
+
+class AsyncCreateCheckoutSession(AsyncAPIView):
+
+    async def get(self, request, pk):
+        appointment = await (Appointment.objects.select_related("location", "customer")
+                             .filter(id=pk, created_by=request.user).afirst())
+        if appointment is None:
+            raise Http404
+
+        reason = await sync_to_async(checkout_sessions.blocked_reason)(appointment)
+        if reason:
+            return self.respond({"message": reason})
+
+        if settings.STRIPE_CHECKOUT_ASYNC:
+            payment = await sync_to_async(checkout_sessions.reserve)(appointment)
+            status_url = request.build_absolute_uri(reverse("api_rest:checkout_status", args=[payment.token]))
+            return self.respond(checkout_sessions.accepted_body(payment, status_url),
+                                status.HTTP_202_ACCEPTED, headers={"Location": status_url})
+
+        unit_amount = checkout_sessions.amount_cents(appointment.price)
+        session = await stripe_gateway.acreate_checkout_session(checkout_sessions.session_params(appointment, unit_amount))
+        await sync_to_async(checkout_sessions.record_session)(appointment, session, unit_amount)
+
+        return self.respond({"message": checkout_sessions.CREATED_MESSAGE}, status.HTTP_201_CREATED)
+
+
+class AsyncCheckoutSessionStatus(AsyncAPIView):
+
+    async def get(self, request, token):
+        serializer = CheckoutStatusQuerySerializer(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+
+        payments = UserPayment.objects.filter(appointment__created_by=request.user)
+        row = await checkout_sessions.await_for_status(payments, token, serializer.validated_data["wait"])
+        if row is None:
+            return self.respond({"detail": "Pagamento não encontrado"}, status.HTTP_404_NOT_FOUND)
+
+        return self.respond(checkout_sessions.status_body(row))
+
+
+class AsyncEstablishmentStripeConnect(AsyncAPIView):
+
+    async def get(self, request):
+        establishment = await sync_to_async(get_user_establishment)(request.user, request.GET.get("establishment_id"),
+                                                                    fresh=True)
+
+        if stripe_connect.is_connected(establishment):
+            return self.respond(stripe_connect.ALREADY_CONNECTED)
+
+        if not establishment.stripe_account_id:
+            account = await stripe_gateway.acreate_account(stripe_connect.account_params(establishment, request.user.email))
+            await sync_to_async(stripe_connect.attach_account)(establishment, account)
+
+        account_link = await stripe_gateway.acreate_account_link(stripe_connect.account_link_params(establishment))
+
+        return self.respond({"url": account_link["url"], "connected": False})
+
+
+class AsyncStripeConnectRefresh(AsyncAPIView):
+
+    async def get(self, request):
+        establishment = await onboarding_establishment(request)
+
+        account_link = await stripe_gateway.acreate_account_link(stripe_connect.account_link_params(establishment))
+
+        return redirect(account_link["url"])
+
+
+class AsyncStripeConnectReturn(AsyncAPIView):
+    authenticated = False
+
+    async def get(self, request):
+        establishment = await onboarding_establishment(request)
+
+        account = await stripe_gateway.aretrieve_account(establishment.stripe_account_id)
+        await sync_to_async(stripe_connect.apply_account)(establishment, account)
+
+        return redirect("api_rest:success_connect_stripe")
@@ -0,0 +1,78 @@
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Strong ETag of any JSON-serializable parts."""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def set_validators(response, etag, last_modified=None):
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    # Per-user data: only the client may store it, and it must revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 (or 412) response if the request's If-None-Match/If-Modified-Since validators match, else None."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified for GET on generic list and detail views, answering 304 before serializing.
+
+    The validators come from one aggregate over the view's filtered queryset: its row
+    count plus the newest value of every column in `conditional_fields`. Any insert,
+    delete or save that bumps an updated_at changes them. List the updated_at of joined
+    models too when the serializer renders their fields (e.g. customer__updated_at).
+
+    Lists only send the ETag: deleting a row does not move their newest updated_at, so
+    If-Modified-Since alone would keep answering 304 with the deleted row in it.
+    """
+    conditional_fields = ("updated_at",)
+
+    def is_detail(self):
+        return (self.lookup_url_kwarg or self.lookup_field) in self.kwargs
+
+    def get_conditional_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.is_detail():
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_validators(self, request):
+        aggregates = self.get_conditional_queryset().aggregate(
+            count=Count("pk"),
+            **{f"max_{n}": Max(field) for n, field in enumerate(self.conditional_fields)},
+        )
+        newest = [value for key, value in aggregates.items() if key != "count" and value is not None]
+        last_modified = max(newest) if newest and self.is_detail() else None
+
+        # The path carries the query string (filters, cursor) that changes the representation
+        etag = make_etag(request.user.pk, request.get_full_path(), *aggregates.values())
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+
+        cached = not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
@@ -0,0 +1,123 @@
+import statistics
+import time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api_rest.models import Establishment
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request latency of a small authenticated endpoint "
+        "(GET stripe/status by default) with each DB_POOL_MODE: a new connection per "
+        "request, persistent connections and, on PostgreSQL with psycopg_pool installed, "
+        "the psycopg 3 pool. Requests go through Django's WSGI handler, so connections "
+        "are opened and closed exactly as under gunicorn. The user it creates is deleted "
+        "at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--url-name", default="api_rest:check_status_integration")
+
+    def handle(self, *args, **options):
+        saved = {key: connection.settings_dict.get(key) for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+        saved_options = dict(connection.settings_dict.get("OPTIONS") or {})
+        user = self.seed()
+        environ = {
+            "PATH_INFO": reverse(options["url_name"]),
+            "HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}",
+        }
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n== {options['requests']} x GET {environ['PATH_INFO']} on {connection.vendor} =="))
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                results = {}
+                for mode in ("none", "persistent", "pool"):
+                    if not self.configure(mode, saved_options):
+                        continue
+                    results[mode] = self.run(environ, options["requests"])
+                    self.line(mode, results[mode], results.get("none"))
+        finally:
+            self.configure_options(saved_options)
+            connection.settings_dict.update(saved)
+            connection.close()
+            user.delete()
+
+    def seed(self):
+        user = User.objects.create(username="bench-db-connections", email="bench-db-connections@example.com")
+        Establishment.objects.create(
+            name="Bench", cnpj="0", city="São Paulo", state="SP",
+            adress="Rua", number="1", phone="0", owner=user,
+        )
+        return user
+
+    def configure(self, mode, saved_options):
+        connection.close()
+        self.configure_options(saved_options)
+        connection.settings_dict["CONN_HEALTH_CHECKS"] = True
+
+        if mode == "pool":
+            if connection.vendor != "postgresql" or not self.has_pool():
+                self.stdout.write(self.style.WARNING("pool: skipped, needs PostgreSQL with psycopg 3 and psycopg_pool"))
+                return False
+            connection.settings_dict["CONN_MAX_AGE"] = 0
+            self.configure_options({**saved_options, "pool": {"min_size": 1, "max_size": 1}})
+        else:
+            connection.settings_dict["CONN_MAX_AGE"] = 0 if mode == "none" else 60
+            self.configure_options({key: value for key, value in saved_options.items() if key != "pool"})
+        return True
+
+    def configure_options(self, options):
+        if connection.vendor == "postgresql" and connection.settings_dict.get("OPTIONS", {}).get("pool"):
+            connection.close_pool()
+        connection.settings_dict["OPTIONS"] = options
+
+    def has_pool(self):
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            return False
+        return connection.Database.__name__ == "psycopg"
+
+    def run(self, environ, requests):
+        handler = WSGIHandler()
+        latencies = []
+        # Warm-up: URL resolver, establishment cache, first connection of the pool
+        for _ in range(5):
+            self.request(handler, environ)
+        for _ in range(requests):
+            started = time.perf_counter()
+            self.request(handler, environ)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def request(self, handler, extra):
+        environ = {"REQUEST_METHOD": "GET", "HTTP_HOST": "testserver", "wsgi.input": BytesIO(), **extra}
+        setup_testing_defaults(environ)
+        status_line = []
+        response = handler(environ, lambda status, headers, exc_info=None: status_line.append(status))
+        b"".join(response)
+        # Like a WSGI server: fires request_finished, which closes or keeps the connection
+        response.close()
+        if not status_line[0].startswith("2"):
+            raise CommandError(f"GET {environ['PATH_INFO']} answered {status_line[0]}")
+
+    def line(self, mode, latencies, baseline):
+        mean = statistics.fmean(latencies) * 1000
+        p50 = statistics.median(latencies) * 1000
+        text = f"{mode}: mean {mean:.2f} ms, p50 {p50:.2f} ms"
+        if baseline is not None and latencies is not baseline:
+            text += f", {statistics.fmean(baseline) * 1000 - mean:.2f} ms saved per request"
+        self.stdout.write(text)
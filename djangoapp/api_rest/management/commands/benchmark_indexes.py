@@ -0,0 +1,154 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from api_rest.models import Appointment, Customer, Establishment, UserPayment
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset inside a transaction and show the query plans and "
+        "timings of the tenant-scoped queries with and without the api_rest indexes. "
+        "Everything is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owners", type=int, default=20)
+        parser.add_argument("--appointments", type=int, default=2000, help="Appointments per owner")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                owner, checkout_id = self.seed(options["owners"], options["appointments"])
+                self.analyze()
+                self.report("with indexes", owner, checkout_id, options["repeat"])
+                self.drop_indexes()
+                self.analyze()
+                self.report("without indexes", owner, checkout_id, options["repeat"])
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def seed(self, owners, appointments_per_owner):
+        rng = random.Random(42)
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(username=f"bench-owner-{i}", email=f"bench-owner-{i}@example.com")
+            for i in range(owners)
+        ])
+
+        establishments = Establishment.objects.bulk_create([
+            Establishment(
+                name=f"Bench {i}", cnpj="0", city="São Paulo", state="SP",
+                adress="Rua", number="1", phone="0", owner=user,
+            )
+            for i, user in enumerate(users)
+        ])
+
+        customers = Customer.objects.bulk_create([
+            Customer(
+                full_name=f"Cliente {u}-{i}", phone=f"+55 11 9{u:03d}{i:05d}",
+                email=f"cliente{u}-{i}@example.com", created_by=user,
+            )
+            for u, user in enumerate(users)
+            for i in range(max(appointments_per_owner // 10, 1))
+        ])
+        customers_by_owner = {}
+        for customer in customers:
+            customers_by_owner.setdefault(customer.created_by_id, []).append(customer)
+
+        appointments = Appointment.objects.bulk_create([
+            Appointment(
+                customer=rng.choice(customers_by_owner[user.id]),
+                location=establishment,
+                start_at=now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+                status=rng.choice(Appointment.Status.values),
+                price=Decimal("60.00"),
+                payment_method=rng.choice(Appointment.Payment.values),
+                created_by=user,
+            )
+            for user, establishment in zip(users, establishments)
+            for _ in range(appointments_per_owner)
+        ], batch_size=2000)
+
+        payments = UserPayment.objects.bulk_create([
+            UserPayment(
+                customer_id=appointment.customer_id,
+                appointment=appointment,
+                establishment_id=appointment.location_id,
+                stripe_checkout_id=f"cs_bench_{appointment.id}",
+                price=appointment.price,
+                amount_cents=6000,
+                currency="brl",
+                has_paid=rng.random() < 0.3,
+            )
+            for appointment in appointments
+            if rng.random() < 0.5
+        ], batch_size=2000)
+
+        self.stdout.write(
+            f"Seeded {len(users)} owners, {len(customers)} customers, "
+            f"{len(appointments)} appointments, {len(payments)} payments."
+        )
+        return users[0], payments[len(payments) // 2].stripe_checkout_id
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Appointment, Customer, UserPayment):
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+    def cases(self, owner, checkout_id):
+        week_start = timezone.now()
+        week_end = week_start + timedelta(days=7)
+
+        appointments_page = (Appointment.objects
+                             .filter(created_by=owner)
+                             .order_by("-created_at", "-id")[:50])
+        appointments_week = (Appointment.objects
+                             .filter(created_by=owner, start_at__gte=week_start, start_at__lt=week_end))
+        customers_page = (Customer.objects
+                          .filter(created_by=owner)
+                          .order_by("-created_at", "-id")[:50])
+        paid_payments = UserPayment.objects.filter(establishment__owner=owner, has_paid=True)
+        checkout = UserPayment.objects.filter(stripe_checkout_id=checkout_id)
+
+        return [
+            ("appointments page", appointments_page, lambda: list(appointments_page.all())),
+            ("appointments week", appointments_week, lambda: list(appointments_week.all())),
+            ("customers page", customers_page, lambda: list(customers_page.all())),
+            ("paid revenue", paid_payments, lambda: paid_payments.aggregate(total=Sum("price"))),
+            ("webhook checkout", checkout, lambda: checkout.first()),
+        ]
+
+    def report(self, title, owner, checkout_id, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {title} =="))
+
+        for label, queryset, run in self.cases(owner, checkout_id):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(self.style.MIGRATE_LABEL(f"{label}: median {statistics.median(timings):.2f} ms"))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,93 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api_rest.models import Appointment, Customer, Establishment
+from api_rest.readers import AppointmentReader
+from api_rest.serializers import AppointmentSerializer
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed appointments inside a transaction and compare building the appointment list "
+        "with AppointmentSerializer against the .values() reader. Everything is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                owner = self.seed(options["rows"])
+                self.report(owner, options["repeat"])
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def seed(self, rows):
+        now = timezone.now()
+        owner = User.objects.create(username="bench-readers", email="bench-readers@example.com")
+        establishment = Establishment.objects.create(
+            name="Bench", cnpj="0", city="São Paulo", state="SP", adress="Rua", number="1", phone="0", owner=owner,
+        )
+        customers = Customer.objects.bulk_create([
+            Customer(full_name=f"Cliente {n}", phone=str(n), email=f"c{n}@example.com", created_by=owner)
+            for n in range(100)
+        ])
+        Appointment.objects.bulk_create([
+            Appointment(
+                customer=customers[n % len(customers)],
+                location=establishment,
+                start_at=now + timedelta(hours=n),
+                end_at=now + timedelta(hours=n, minutes=30),
+                status=Appointment.Status.values[n % len(Appointment.Status.values)],
+                payment_method=Appointment.Payment.values[n % len(Appointment.Payment.values)],
+                price=Decimal("80.00"),
+                created_by=owner,
+            )
+            for n in range(rows)
+        ], batch_size=1000)
+        return owner
+
+    def report(self, owner, repeat):
+        queryset = Appointment.objects.filter(created_by=owner).order_by("-created_at", "-id")
+        reader = AppointmentReader()
+
+        def with_serializer():
+            return AppointmentSerializer(queryset.select_related("customer", "location"), many=True).data
+
+        def with_reader():
+            return reader.rows(queryset.values(*reader.columns()))
+
+        if JSONRenderer().render(with_serializer()) != JSONRenderer().render(with_reader()):
+            self.stdout.write(self.style.ERROR("Reader output differs from AppointmentSerializer!"))
+
+        serializer_ms = self.time(with_serializer, repeat)
+        reader_ms = self.time(with_reader, repeat)
+        self.stdout.write(
+            f"{queryset.count()} rows: serializer {serializer_ms:.1f} ms, "
+            f"values reader {reader_ms:.1f} ms ({serializer_ms / reader_ms:.1f}x faster)"
+        )
+
+    def time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,105 @@
+import io
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api_rest.models import Appointment, Customer, Establishment
+from api_rest.renderers import FastJSONParser, FastJSONRenderer, orjson
+from api_rest.serializers import AppointmentSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's stdlib JSON renderer/parser with the orjson-backed ones on an "
+        "appointment list payload built in memory (nothing is written to the database)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed: FastJSONRenderer falls back to json."))
+
+        rows, repeat = options["rows"], options["repeat"]
+        serialized = AppointmentSerializer(self.appointments(rows), many=True).data
+        payloads = {
+            "AppointmentSerializer output": serialized,
+            "raw Decimal/datetime/UUID values": self.raw_rows(rows),
+        }
+
+        for label, data in payloads.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {label}, {rows} rows =="))
+
+            expected = JSONRenderer().render(data)
+            rendered = FastJSONRenderer().render(data)
+            if rendered != expected:
+                self.stdout.write(self.style.ERROR("Output differs from JSONRenderer!"))
+
+            stdlib = self.time(lambda: JSONRenderer().render(data), repeat)
+            fast = self.time(lambda: FastJSONRenderer().render(data), repeat)
+            self.line("render", stdlib, fast, len(expected))
+
+            stdlib = self.time(lambda: JSONParser().parse(io.BytesIO(expected)), repeat)
+            fast = self.time(lambda: FastJSONParser().parse(io.BytesIO(expected)), repeat)
+            self.line("parse", stdlib, fast, len(expected))
+
+    def appointments(self, rows):
+        now = timezone.now()
+        establishment = Establishment(id=1, name="Bench")
+        customers = [Customer(id=n, full_name=f"Cliente Benchmark {n} São João") for n in range(1, 501)]
+        statuses = Appointment.Status.values
+        methods = Appointment.Payment.values
+
+        return [
+            Appointment(
+                id=n,
+                customer=customers[n % len(customers)],
+                location=establishment,
+                start_at=now + timedelta(hours=n),
+                end_at=now + timedelta(hours=n, minutes=45),
+                status=statuses[n % len(statuses)],
+                payment_method=methods[n % len(methods)],
+                price=Decimal(f"{50 + n % 200}.90"),
+                number_people=1 + n % 4,
+                observation="Observação do agendamento" if n % 3 else None,
+                created_at=now,
+                updated_at=now,
+            )
+            for n in range(1, rows + 1)
+        ]
+
+    def raw_rows(self, rows):
+        now = timezone.now()
+        return [
+            {
+                "id": n,
+                "token": uuid.UUID(int=n),
+                "start_at": now + timedelta(hours=n),
+                "day": (now + timedelta(hours=n)).date(),
+                "price": Decimal(f"{50 + n % 200}.90"),
+            }
+            for n in range(1, rows + 1)
+        ]
+
+    def time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def line(self, label, stdlib, fast, size):
+        self.stdout.write(
+            f"{label}: json {stdlib:.2f} ms, orjson {fast:.2f} ms "
+            f"({stdlib / fast:.1f}x faster) for {size / 1024:.0f} KiB"
+        )
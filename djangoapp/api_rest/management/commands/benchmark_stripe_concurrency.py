@@ -0,0 +1,68 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from api_rest.services import stripe_gateway
+from api_rest.services.fake_stripe import FakeStripeServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many Stripe calls per second a sync worker (a fixed pool of threads, like "
+        "gunicorn --threads) and one async event loop (the ASGI views) complete against a local "
+        "fake Stripe that answers after --latency seconds. Nothing leaves the machine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=200)
+        parser.add_argument("--latency", type=float, default=0.2, help="Seconds the fake Stripe waits before answering")
+        parser.add_argument("--threads", type=int, default=4, help="Sync threads (2 workers x 2 threads today)")
+        parser.add_argument("--concurrency", type=int, default=200, help="Calls the async loop keeps in flight")
+
+    def handle(self, *args, **options):
+        calls, latency = options["calls"], options["latency"]
+        server = FakeStripeServer(default=(200, {"id": "acct_bench", "object": "account"}, latency)).start()
+
+        overrides = override_settings(
+            STRIPE_SECRET_KEY="sk_test_benchmark",
+            STRIPE_API_BASE=server.url,
+            STRIPE_READ_TIMEOUT=max(10, latency * 10),
+            STRIPE_CIRCUIT_THRESHOLD=calls + 1,
+        )
+        try:
+            with overrides:
+                stripe_gateway.reset()
+                if stripe_gateway.httpx is None:
+                    self.stdout.write(self.style.WARNING(
+                        "httpx is not installed: async calls run in the STRIPE_ASYNC_FALLBACK_THREADS pool."))
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {calls} calls, {latency * 1000:.0f} ms Stripe latency =="))
+                self.line(f"sync, {options['threads']} threads", calls, self.run_sync(calls, options["threads"]))
+                self.line(f"async, {options['concurrency']} in flight", calls,
+                          asyncio.run(self.run_async(calls, options["concurrency"])))
+        finally:
+            stripe_gateway.reset()
+            server.stop()
+
+    def run_sync(self, calls, threads):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: stripe_gateway.retrieve_account("acct_bench"), range(calls)))
+        return time.perf_counter() - started
+
+    async def run_async(self, calls, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with semaphore:
+                await stripe_gateway.aretrieve_account("acct_bench")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(calls)))
+        return time.perf_counter() - started
+
+    def line(self, label, calls, elapsed):
+        self.stdout.write(f"{label}: {elapsed:.2f} s, {calls / elapsed:.0f} calls/s")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api_rest.models import Establishment
+from api_rest.services.appointment_export import FIELDS, export_rows
+from api_rest.services.streaming import csv_lines, ndjson_lines
+
+
+class Command(BaseCommand):
+    help = "Stream the appointments and payments of an establishment over a date range as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("establishment_id", type=int)
+        parser.add_argument("--start", required=True, help="First day, YYYY-MM-DD")
+        parser.add_argument("--end", required=True, help="Last day, YYYY-MM-DD")
+        parser.add_argument("--file-format", choices=["csv", "ndjson"], default="csv")
+        parser.add_argument("--output", help="File to write, defaults to stdout")
+
+    def handle(self, *args, **options):
+        start, end = parse_date(options["start"]), parse_date(options["end"])
+        if not (start and end) or end < start:
+            raise CommandError("Informe --start e --end no formato YYYY-MM-DD, com end >= start")
+
+        try:
+            establishment = Establishment.objects.get(pk=options["establishment_id"])
+        except Establishment.DoesNotExist:
+            raise CommandError("Estabelecimento não encontrado")
+
+        lines = csv_lines if options["file_format"] == "csv" else ndjson_lines
+        rows = export_rows(establishment, start, end)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(lines(FIELDS, rows))
+            return
+
+        for line in lines(FIELDS, rows):
+            self.stdout.write(line, ending="")
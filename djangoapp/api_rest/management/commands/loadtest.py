@@ -0,0 +1,173 @@
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Environment each profile passes to gunicorn.conf.py
+PROFILES = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread"},
+    "gthread-no-preload": {"GUNICORN_WORKER_CLASS": "gthread", "GUNICORN_PRELOAD": "0"},
+    "uvicorn": {"GUNICORN_WORKER_CLASS": "uvicorn"},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name may contain spaces: the parent pid follows its closing parenthesis
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return found
+
+
+def memory_kb(pid):
+    # Pss splits shared (copy-on-write) pages between the processes that map them, so the
+    # sum over master and workers is what the box really spends; Rss would count them N times
+    for path, field in ((f"/proc/{pid}/smaps_rollup", "Pss:"), (f"/proc/{pid}/status", "VmRSS:")):
+        try:
+            with open(path) as stats:
+                for line in stats:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except OSError:
+            continue
+    return 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the web server. With --url, hit a running server; with --profiles, start "
+        "gunicorn -c gunicorn.conf.py once per profile on a local port and report the "
+        "throughput, latency and memory (Pss of master plus workers) of each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Full URL of a running server to load test")
+        parser.add_argument("--profiles", help=f"Comma separated, any of: {', '.join(PROFILES)}")
+        parser.add_argument("--path", default="/api/success/", help="Path requested in --profiles mode")
+        parser.add_argument("--header", action="append", default=[], help='Extra header, "Name: value"')
+        parser.add_argument("--concurrency", type=int, default=16, help="Client threads")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds of load per run")
+        parser.add_argument("--workers", type=int, help="WEB_CONCURRENCY for every profile (default: autosized)")
+
+    def handle(self, *args, **options):
+        if bool(options["url"]) == bool(options["profiles"]):
+            raise CommandError("Use either --url or --profiles")
+
+        headers = {}
+        for header in options["header"]:
+            name, _, value = header.partition(":")
+            headers[name.strip()] = value.strip()
+
+        if options["url"]:
+            self.report(options["url"], self.load(options["url"], headers, options))
+            return
+
+        names = [name.strip() for name in options["profiles"].split(",") if name.strip()]
+        unknown = set(names) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        for name in names:
+            if name == "uvicorn" and importlib.util.find_spec("uvicorn") is None:
+                self.stdout.write(self.style.WARNING("uvicorn: skipped, uvicorn is not installed"))
+                continue
+            self.run_profile(name, headers, options)
+
+    def run_profile(self, name, headers, options):
+        port = free_port()
+        env = {**os.environ, **PROFILES[name], "GUNICORN_BIND": f"127.0.0.1:{port}", "GUNICORN_ACCESSLOG": ""}
+        if options["workers"]:
+            env["WEB_CONCURRENCY"] = str(options["workers"])
+        allowed_hosts = env.get("ALLOWED_HOSTS", "")
+        if "127.0.0.1" not in allowed_hosts.split(","):
+            env["ALLOWED_HOSTS"] = ",".join(filter(None, [allowed_hosts, "127.0.0.1"]))
+
+        server = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py"], cwd=settings.BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f"http://127.0.0.1:{port}{options['path']}"
+        try:
+            self.wait_ready(server, url)
+            result = self.load(url, headers, options)
+            workers = children(server.pid)
+            result["workers"] = len(workers)
+            result["memory_mb"] = sum(memory_kb(pid) for pid in [server.pid, *workers]) / 1024
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+        self.report(name, result)
+
+    def wait_ready(self, server, url, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn exited with code {server.returncode}")
+            try:
+                requests.get(url, timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise CommandError(f"gunicorn did not answer {url} within {timeout} s")
+
+    def load(self, url, headers, options):
+        latencies, errors = [], []
+        deadline = time.monotonic() + options["duration"]
+
+        def client():
+            # One keep-alive connection per client thread, like a browser or a proxy upstream
+            session = requests.Session()
+            mine, failed = [], 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = session.get(url, headers=headers, timeout=30)
+                    failed += response.status_code >= 400
+                except requests.RequestException:
+                    failed += 1
+                mine.append(time.perf_counter() - started)
+            latencies.extend(mine)
+            errors.append(failed)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(options["concurrency"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {"requests": len(latencies), "errors": sum(errors), "elapsed": elapsed, "latencies": latencies}
+
+    def report(self, label, result):
+        latencies = result["latencies"]
+        if len(latencies) < 2:
+            raise CommandError(f"{label}: no requests completed")
+        cuts = statistics.quantiles(latencies, n=100)
+        line = (f"{label}: {result['requests'] / result['elapsed']:.0f} req/s, "
+                f"p50 {cuts[49] * 1000:.1f} ms, p99 {cuts[98] * 1000:.1f} ms, "
+                f"{result['errors']} errors of {result['requests']}")
+        if "memory_mb" in result:
+            line += f", {result['workers']} workers, {result['memory_mb']:.0f} MB"
+        self.stdout.write(line)
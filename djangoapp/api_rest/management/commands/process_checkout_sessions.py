@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api_rest.services.checkout_sessions import process_pending
+
+
+class Command(BaseCommand):
+    help = "Create the Stripe checkout sessions reserved while STRIPE_CHECKOUT_ASYNC is enabled and email their links."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument("--loop", action="store_true", help="Keep polling for reservations instead of exiting")
+        parser.add_argument("--interval", type=float, default=1, help="Seconds to sleep when there is nothing to process")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                created, failed = process_pending(options["batch_size"])
+
+                if created or failed:
+                    self.stdout.write(f"Created {created}, failed {failed}")
+                if created:
+                    continue
+
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api_rest.services.stripe_events import process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Apply Stripe webhook events recorded while STRIPE_WEBHOOK_DEFER is enabled."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new events instead of exiting")
+        parser.add_argument("--interval", type=float, default=2, help="Seconds to sleep when there is nothing to process")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                processed, failed = process_pending_events(options["batch_size"])
+
+                if processed or failed:
+                    self.stdout.write(f"Processed {processed}, failed {failed}")
+                if processed:
+                    continue
+
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
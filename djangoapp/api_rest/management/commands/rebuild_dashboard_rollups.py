@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api_rest.services.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the AppointmentDailySummary rollup from the Appointment table."
+
+    def handle(self, *args, **options):
+        rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS("Dashboard rollups rebuilt."))
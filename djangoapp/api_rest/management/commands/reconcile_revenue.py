@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api_rest.services.revenue import find_drift, rebuild_totals
+
+
+class Command(BaseCommand):
+    help = "Compare the cached establishment revenue with UserPayment, report drift and rebuild the totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report drift, do not rebuild")
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+
+        for establishment_id, day, stored, expected in drift:
+            bucket = day.isoformat() if day else "total"
+            self.stdout.write(
+                f"establishment {establishment_id} {bucket}: "
+                f"stored {stored[0]} / {stored[1]}, expected {expected[0]} / {expected[1]}"
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Revenue totals match UserPayment."))
+            return
+
+        self.stdout.write(self.style.WARNING(f"{len(drift)} bucket(s) drifted."))
+        if not options["dry_run"]:
+            rebuild_totals()
+            self.stdout.write(self.style.SUCCESS("Revenue totals rebuilt from UserPayment."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api_rest.services.email_outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued OutboundEmail rows, reusing one mail connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--loop", action="store_true", help="Keep polling the outbox instead of exiting when it is empty")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to sleep when there is nothing to send")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                sent, failed = deliver_batch(options["batch_size"])
+
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent}, failed {failed}")
+                    continue
+
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0007_userpayment_establishment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['created_by', 'start_at'], name='appointment_owner_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='appointment_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='customer_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userpayment',
+            index=models.Index(fields=['stripe_checkout_id'], name='userpayment_checkout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userpayment',
+            index=models.Index(condition=models.Q(('has_paid', True)), fields=['establishment', 'price'], name='userpayment_paid_idx'),
+        ),
+    ]
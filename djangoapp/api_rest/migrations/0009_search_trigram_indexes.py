@@ -0,0 +1,43 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# (index name, table, column) served by the icontains lookups of services/search.py.
+# Django renders icontains on Postgres as UPPER("column"::text) LIKE UPPER(%s),
+# so the indexes are built over that same expression.
+TRIGRAM_INDEXES = [
+    ("customer_full_name_trgm_idx", "api_rest_customer", "full_name"),
+    ("customer_phone_trgm_idx", "api_rest_customer", "phone"),
+    ("customer_email_trgm_idx", "api_rest_customer", "email"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN/pg_trgm only exist on Postgres; SQLite keeps plain LIKE scans
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0008_tenant_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
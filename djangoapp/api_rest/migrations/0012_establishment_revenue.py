@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:06
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_revenue(apps, schema_editor):
+    # Seed the running totals from the payments that were already paid
+    UserPayment = apps.get_model('api_rest', 'UserPayment')
+    EstablishmentRevenue = apps.get_model('api_rest', 'EstablishmentRevenue')
+    EstablishmentRevenueDay = apps.get_model('api_rest', 'EstablishmentRevenueDay')
+
+    rows = (UserPayment.objects
+            .filter(has_paid=True, establishment__isnull=False)
+            .annotate(day=TruncDate(Coalesce('paid_at', 'created_at')))
+            .values('establishment_id', 'day')
+            .annotate(count=Count('id'), total=Sum('price')))
+
+    days, totals = [], {}
+    for row in rows:
+        days.append(EstablishmentRevenueDay(
+            establishment_id=row['establishment_id'], day=row['day'],
+            paid_count=row['count'], paid_total=row['total'],
+        ))
+        count, total = totals.get(row['establishment_id'], (0, Decimal('0')))
+        totals[row['establishment_id']] = (count + row['count'], total + row['total'])
+
+    EstablishmentRevenueDay.objects.bulk_create(days)
+    EstablishmentRevenue.objects.bulk_create([
+        EstablishmentRevenue(establishment_id=establishment_id, paid_count=count, paid_total=total)
+        for establishment_id, (count, total) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0011_stripeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpayment',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='EstablishmentRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paid_count', models.PositiveIntegerField(default=0)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('establishment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='revenue', to='api_rest.establishment')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EstablishmentRevenueDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('paid_count', models.PositiveIntegerField(default=0)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('establishment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_days', to='api_rest.establishment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('establishment', 'day'), name='revenue_day_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_revenue, migrations.RunPython.noop),
+    ]
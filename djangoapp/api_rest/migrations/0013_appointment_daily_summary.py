@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_summary(apps, schema_editor):
+    Appointment = apps.get_model('api_rest', 'Appointment')
+    AppointmentDailySummary = apps.get_model('api_rest', 'AppointmentDailySummary')
+
+    rows = (Appointment.objects
+            .filter(start_at__isnull=False)
+            .annotate(day=TruncDate('start_at'))
+            .values('location_id', 'day', 'status', 'payment_method')
+            .annotate(count=Count('id'), people=Sum('number_people'), total=Sum('price')))
+
+    AppointmentDailySummary.objects.bulk_create([
+        AppointmentDailySummary(
+            establishment_id=row['location_id'], day=row['day'],
+            status=row['status'], payment_method=row['payment_method'],
+            appointment_count=row['count'], number_people=row['people'], price_total=row['total'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0012_establishment_revenue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('SCHEDULED', 'Agendado'), ('CONFIRMED', 'Confirmado'), ('CANCELED', 'Cancelado')])),
+                ('payment_method', models.CharField(choices=[('PIX', 'Pix'), ('CARD', 'Cartão de crédito')])),
+                ('appointment_count', models.IntegerField(default=0)),
+                ('number_people', models.IntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('establishment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='api_rest.establishment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('establishment', 'day', 'status', 'payment_method'), name='daily_summary_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def backfill_end_at(apps, schema_editor):
+    # Appointments booked before end_at existed get the default duration, like new
+    # bookings, so they keep blocking their slot. An active one is clipped to the
+    # start of the next active booking of its establishment, and left empty when an
+    # earlier booking already covers its start, so the ranges never overlap and the
+    # exclusion constraint holds. Empty ranges (end_at = start_at) are filled the same way
+    Appointment = apps.get_model('api_rest', 'Appointment')
+    duration = timedelta(minutes=settings.APPOINTMENT_DEFAULT_DURATION_MINUTES)
+    missing = Q(end_at__isnull=True) | Q(end_at=F('start_at'))
+
+    # Canceled bookings block nothing
+    Appointment.objects.filter(missing, status='CANCELED', start_at__isnull=False).update(end_at=F('start_at') + duration)
+
+    rows = (Appointment.objects
+            .filter(start_at__isnull=False)
+            .exclude(status='CANCELED')
+            .order_by('location_id', 'start_at', 'pk')
+            .values_list('pk', 'location_id', 'start_at', 'end_at')
+            .iterator(chunk_size=2000))
+
+    changed = []
+    for _, bookings in groupby(rows, key=lambda row: row[1]):
+        bookings = list(bookings)
+        reach = None
+        for index, (pk, _, start_at, end_at) in enumerate(bookings):
+            if end_at is None or end_at == start_at:
+                end_at = start_at + duration
+                if index + 1 < len(bookings):
+                    end_at = min(end_at, bookings[index + 1][2])
+                if reach is not None and reach > start_at:
+                    end_at = start_at
+                changed.append(Appointment(pk=pk, end_at=end_at))
+            reach = end_at if reach is None else max(reach, end_at)
+
+    Appointment.objects.bulk_update(changed, ['end_at'], batch_size=500)
+
+
+def create_overlap_constraint(apps, schema_editor):
+    # Race-free guarantee on Postgres; SQLite relies on Appointment.clean() and its
+    # serialized writes
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute(
+        'ALTER TABLE "api_rest_appointment" ADD CONSTRAINT "appointment_no_overlap" '
+        'EXCLUDE USING gist ("location_id" WITH =, tstzrange("start_at", "end_at", \'[)\') WITH &&) '
+        'WHERE (status <> \'CANCELED\' AND start_at IS NOT NULL AND end_at IS NOT NULL)'
+    )
+
+
+def drop_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute('ALTER TABLE "api_rest_appointment" DROP CONSTRAINT IF EXISTS "appointment_no_overlap"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0013_appointment_daily_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='end_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'CANCELED'), _negated=True), fields=['location', 'start_at'], name='appointment_slot_idx'),
+        ),
+        migrations.RunPython(backfill_end_at, migrations.RunPython.noop),
+        BtreeGistExtension(),
+        migrations.RunPython(create_overlap_constraint, drop_overlap_constraint),
+    ]
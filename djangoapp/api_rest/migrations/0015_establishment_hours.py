@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:11
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0014_appointment_end_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='establishment',
+            name='closes_at',
+            field=models.TimeField(default=datetime.time(18, 0)),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='opens_at',
+            field=models.TimeField(default=datetime.time(8, 0)),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='slot_minutes',
+            field=models.PositiveIntegerField(default=60),
+        ),
+    ]
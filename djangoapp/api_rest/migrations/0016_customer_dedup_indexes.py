@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0015_establishment_hours'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_by', 'email'], name='customer_owner_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_by', 'phone'], name='customer_owner_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0017_customer_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['created_by', 'status', 'start_at'], name='appointment_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0018_appointment_status_filter_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpayment',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userpayment',
+            name='checkout_status',
+            field=models.CharField(choices=[('PENDING', 'Pendente'), ('READY', 'Pronto'), ('FAILED', 'Falhou')], default='READY', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='userpayment',
+            name='checkout_url',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='userpayment',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='userpayment',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='userpayment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='userpayment',
+            index=models.Index(condition=models.Q(('checkout_status', 'PENDING')), fields=['next_attempt_at'], name='userpayment_checkout_due_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from importlib import import_module
+
+from django.db import migrations
+
+
+def backfill_end_at(apps, schema_editor):
+    # 0014 used to store the appointments booked before end_at existed as empty
+    # ranges, which block no slot: give them their duration now
+    import_module('api_rest.migrations.0014_appointment_end_at').backfill_end_at(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0019_userpayment_checkout_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_end_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:35
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_rest', '0020_appointment_end_at_rebackfill'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_owner_email_idx',
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Lower('email'), name='customer_owner_lower_email_idx'),
+        ),
+    ]
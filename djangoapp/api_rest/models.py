@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 import uuid
+from datetime import time, timedelta
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
@@ -11,8 +15,18 @@ class Customer(models.Model):
     phone = models.CharField(max_length=50, null=False, blank=False,)
     email = models.EmailField(max_length=100, null=False, blank=False,)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="customers", blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Customers list: created_by=user ordered by the pagination cursor
+            models.Index(fields=["created_by", "-created_at", "-id"], name="customer_owner_created_idx"),
+            # Import deduplication: created_by=user and email/phone in a chunk
+            models.Index(models.F("created_by"), Lower("email"), name="customer_owner_lower_email_idx"),
+            models.Index(fields=["created_by", "phone"], name="customer_owner_phone_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.full_name}"
     
@@ -34,6 +48,10 @@ class Establishment(models.Model):
     stripe_charges_enabled = models.BooleanField(default=False)
     stripe_payouts_enabled = models.BooleanField(default=False)
     stripe_details_submitted = models.BooleanField(default=False)
+    # Booking hours used by the available slots endpoint
+    opens_at = models.TimeField(default=time(8, 0))
+    closes_at = models.TimeField(default=time(18, 0))
+    slot_minutes = models.PositiveIntegerField(default=60)
 
 
     def __str__(self) -> str:
@@ -53,6 +71,7 @@ class Appointment(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="appoinments")    
     location = models.ForeignKey(Establishment, on_delete=models.CASCADE, related_name="appointments")  
     start_at = models.DateTimeField(null=True, blank=True)
+    end_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(choices=Status.choices)
     price = models.DecimalField(decimal_places=2, max_digits=10)
     payment_method = models.CharField(choices=Payment.choices)
@@ -62,15 +81,75 @@ class Appointment(models.Model):
     number_people = models.IntegerField(default=1)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="appointments", blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Calendar reads: created_by=user and a start_at range
+            models.Index(fields=["created_by", "start_at"], name="appointment_owner_start_idx"),
+            # Structured filters: created_by=user, status IN (...) and a start_at range
+            models.Index(fields=["created_by", "status", "start_at"], name="appointment_status_start_idx"),
+            # Appointments list: created_by=user ordered by the pagination cursor
+            models.Index(fields=["created_by", "-created_at", "-id"], name="appointment_owner_created_idx"),
+            # Slot index: active bookings of an establishment ordered by start
+            models.Index(fields=["location", "start_at"], condition=~models.Q(status="CANCELED"), name="appointment_slot_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Agendamento de {self.customer.full_name}"
 
+    def overlapping_appointment(self):
+        """Return an active booking of the same establishment that overlaps this one, if any."""
+        if not (self.location_id and self.start_at and self.end_at) or self.status == self.Status.CANCELED:
+            return None
+
+        # Active bookings never overlap each other, so ordered by start they are also
+        # ordered by end: only the last one starting before our end can reach past our
+        # start. That is a single backwards step on appointment_slot_idx.
+        previous = (Appointment.objects
+                    .filter(~models.Q(status=self.Status.CANCELED),
+                            location_id=self.location_id,
+                            start_at__lt=self.end_at,
+                            end_at__gt=models.F("start_at"))
+                    .exclude(pk=self.pk)
+                    .order_by("-start_at")
+                    .first())
+
+        if previous and previous.end_at > self.start_at:
+            return previous
+        return None
+
+    def clean(self):
+        if self.start_at and not self.end_at:
+            self.end_at = self.start_at + timedelta(minutes=settings.APPOINTMENT_DEFAULT_DURATION_MINUTES)
+
+        if self.start_at and self.end_at and self.end_at <= self.start_at:
+            raise ValidationError({"end_at": "O horário final deve ser depois do horário inicial"})
+
+        if self.overlapping_appointment():
+            raise ValidationError({"start_at": "Já existe um agendamento neste horário"})
+
     def save(self, *args, **kwargs):
         self.full_clean() # > call all verify
-        return super().save(*args, **kwargs)
+
+        # The dashboard rollup is updated by signals, keep it in the same transaction
+        try:
+            with transaction.atomic():
+                return super().save(*args, **kwargs)
+        except IntegrityError as error:
+            # Postgres appointment_no_overlap constraint: a concurrent booking won the slot
+            if "appointment_no_overlap" in str(error):
+                raise ValidationError({"start_at": "Já existe um agendamento neste horário"}) from error
+            raise
 
 class UserPayment(models.Model):
+
+    # Lifecycle of the Stripe checkout session behind the payment. Rows written by the
+    # synchronous checkout are born READY; the async one reserves them as PENDING and
+    # python manage.py process_checkout_sessions creates the session
+    class CheckoutStatus(models.TextChoices):
+        PENDING = "PENDING", "Pendente"
+        READY = "READY", "Pronto"
+        FAILED = "FAILED", "Falhou"
+
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE)
     establishment = models.ForeignKey(Establishment, on_delete=models.CASCADE, null=True, blank=True)
@@ -82,7 +161,120 @@ class UserPayment(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3)
     has_paid = models.BooleanField(default=False)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    checkout_status = models.CharField(max_length=10, choices=CheckoutStatus.choices, default=CheckoutStatus.READY)
+    checkout_url = models.TextField(blank=True, default="")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Webhook lookup by checkout session
+            models.Index(fields=["stripe_checkout_id"], name="userpayment_checkout_idx"),
+            # The checkout worker only ever polls pending rows that are due
+            models.Index(fields=["next_attempt_at"], condition=models.Q(checkout_status="PENDING"), name="userpayment_checkout_due_idx"),
+            # Revenue reads only ever look at paid rows
+            models.Index(fields=["establishment", "price"], condition=models.Q(has_paid=True), name="userpayment_paid_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.customer.full_name} - Pago {self.has_paid}"
+
+class OutboundEmail(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pendente"
+        SENT = "SENT", "Enviado"
+        FAILED = "FAILED", "Falhou"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    content_subtype = models.CharField(max_length=20, default="html")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker only ever polls pending rows that are due
+            models.Index(fields=["next_attempt_at"], condition=models.Q(status="PENDING"), name="outboundemail_due_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.subject} - {self.status}"
+
+class StripeEvent(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pendente"
+        PROCESSED = "PROCESSED", "Processado"
+        FAILED = "FAILED", "Falhou"
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], condition=models.Q(status="PENDING"), name="stripeevent_pending_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.type} {self.event_id} - {self.status}"
+
+# Running revenue per establishment, kept up to date by services/revenue.py when
+# the Stripe webhook marks a UserPayment as paid (see manage.py reconcile_revenue)
+class EstablishmentRevenue(models.Model):
+    establishment = models.OneToOneField(Establishment, on_delete=models.CASCADE, related_name="revenue")
+    paid_count = models.PositiveIntegerField(default=0)
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.establishment} - {self.paid_total}"
+
+class EstablishmentRevenueDay(models.Model):
+    establishment = models.ForeignKey(Establishment, on_delete=models.CASCADE, related_name="revenue_days")
+    day = models.DateField()
+    paid_count = models.PositiveIntegerField(default=0)
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["establishment", "day"], name="revenue_day_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.establishment} {self.day} - {self.paid_total}"
+
+# Dashboard rollup: one row per establishment, day, status and payment method,
+# kept in sync with Appointment writes by services/rollups.py
+class AppointmentDailySummary(models.Model):
+    establishment = models.ForeignKey(Establishment, on_delete=models.CASCADE, related_name="daily_summaries")
+    day = models.DateField()
+    status = models.CharField(choices=Appointment.Status.choices)
+    payment_method = models.CharField(choices=Appointment.Payment.choices)
+    appointment_count = models.IntegerField(default=0)
+    number_people = models.IntegerField(default=0)
+    price_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["establishment", "day", "status", "payment_method"], name="daily_summary_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.establishment} {self.day} {self.status}/{self.payment_method}"
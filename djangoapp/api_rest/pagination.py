@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+# Keyset pagination over (created_at, id): every page is an index range scan,
+# so the cost of a page does not grow with the size of the table.
+class CreatedAtCursorPagination(CursorPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
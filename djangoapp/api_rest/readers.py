@@ -0,0 +1,131 @@
+from operator import itemgetter
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from .models import Appointment
+
+# Formatting is delegated to the same DRF fields the serializers use, so output is identical
+_datetime = serializers.DateTimeField().to_representation
+_price = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+
+
+def _datetime_or_none(value):
+    return None if value is None else _datetime(value)
+
+
+def _price_or_none(value):
+    return None if value is None else _price(value)
+
+
+def _labels(choices):
+    labels = dict(choices)
+    return lambda value: str(labels.get(value, value))
+
+
+class ValuesReader:
+    """A serializer's read output built from .values() rows, without model instances.
+
+    `fields` maps every output key, in serializer order, to (column, format(value) or None).
+    """
+
+    fields = {}
+
+    def select(self, fields=None, omit=None):
+        """Output keys kept by ?fields=a,b / ?omit=c, validated against `fields`."""
+        requested = [name for value in (fields, omit) if value for name in value.split(",") if name]
+        unknown = sorted(set(requested) - set(self.fields))
+        if unknown:
+            raise ValidationError({"fields": f"Campos inválidos: {', '.join(unknown)}"})
+
+        keep = set(fields.split(",")) if fields else set(self.fields)
+        keep -= set(omit.split(",")) if omit else set()
+        keys = [key for key in self.fields if key in keep]
+        if not keys:
+            raise ValidationError({"fields": "Informe ao menos um campo"})
+        return keys
+
+    def columns(self, keys=None, extra=()):
+        """The .values() column list needed for `keys`, plus `extra` (e.g. the pagination ordering)."""
+        columns = dict.fromkeys(self.fields[key][0] for key in (keys or self.fields))
+        columns.update(dict.fromkeys(extra))
+        return tuple(columns)
+
+    def rows(self, values, keys=None):
+        keys = keys or list(self.fields)
+        columns = [self.fields[key][0] for key in keys]
+        formats = [self.fields[key][1] for key in keys]
+        get = itemgetter(*columns) if len(columns) > 1 else lambda row: (row[columns[0]],)
+
+        return [
+            {key: value if format_value is None else format_value(value)
+             for key, format_value, value in zip(keys, formats, get(row))}
+            for row in values
+        ]
+
+
+class AppointmentReader(ValuesReader):
+    fields = {
+        "id": ("id", None),
+        "start_at": ("start_at", _datetime_or_none),
+        "end_at": ("end_at", _datetime_or_none),
+        "number_people": ("number_people", None),
+        "payment_method": ("payment_method", None),
+        "payment_method_label": ("payment_method", _labels(Appointment.Payment.choices)),
+        "customer_id_value": ("customer_id", None),
+        "customer_name": ("customer__full_name", None),
+        "price": ("price", _price_or_none),
+        "location_id": ("location_id", None),
+        "location_name": ("location__name", None),
+        "status": ("status", None),
+        "status_label": ("status", _labels(Appointment.Status.choices)),
+        "observation": ("observation", None),
+        "created_at": ("created_at", _datetime_or_none),
+        "updated_at": ("updated_at", _datetime_or_none),
+    }
+
+
+class CustomerReader(ValuesReader):
+    fields = {
+        "id": ("id", None),
+        "full_name": ("full_name", None),
+        "phone": ("phone", None),
+        "email": ("email", None),
+        "created_at": ("created_at", _datetime_or_none),
+        "updated_at": ("updated_at", _datetime_or_none),
+    }
+
+
+class ValuesReadMixin:
+    """list() and retrieve() for generic views that read .values() and format the rows with
+    `reader`, skipping model instances and the serializer. Writes still use serializer_class.
+
+    ?fields=id,status and ?omit=observation prune both the output keys and the SELECT list.
+    """
+
+    reader = None
+
+    def get_reader_keys(self):
+        params = self.request.query_params
+        return self.reader.select(params.get("fields"), params.get("omit"))
+
+    def list(self, request, *args, **kwargs):
+        keys = self.get_reader_keys()
+        # Cursor pagination reads its position from the ordering columns of each row
+        ordering = [field.lstrip("-") for field in getattr(self.paginator, "ordering", None) or ()]
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.reader.columns(keys, ordering))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.reader.rows(page, keys))
+        return Response(self.reader.rows(queryset, keys))
+
+    def retrieve(self, request, *args, **kwargs):
+        keys = self.get_reader_keys()
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.reader.columns(keys))
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(self.reader.rows([row], keys)[0])
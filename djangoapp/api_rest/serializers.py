@@ -1,7 +1,9 @@
 from rest_framework import serializers 
 from .models import Customer, Appointment, Establishment
 from django.core.exceptions import ValidationError
+from .services.establishments import user_establishment
 from django.contrib.auth import get_user_model
+from django.conf import settings
 
 User = get_user_model()
 
@@ -25,7 +27,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appointment
         fields = [
-            "id", "start_at",
+            "id", "start_at", "end_at",
             "number_people","payment_method",
             "payment_method_label", "customer_id",
             "customer_id_value",
@@ -40,17 +42,28 @@ class AppointmentSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         user = request.user
         if request and request.user:
-            establishment = Establishment.objects.filter(owner=user).first()
+            establishment = user_establishment(user)
             
             if establishment:
                 validated_data['location'] = establishment
 
-        return super().create(validated_data)
+        # Appointment.save() runs full_clean(), report its errors (e.g. overlapping slots) as 400
+        try:
+            return super().create(validated_data)
+        except ValidationError as error:
+            raise serializers.ValidationError(error.message_dict)
     
     def update(self, instance, validated_data):
         customer_data = validated_data.pop('customer', None)
+
+        # Rescheduling without an end_at keeps the appointment's duration
+        if "start_at" in validated_data and "end_at" not in validated_data and instance.start_at and instance.end_at:
+            validated_data["end_at"] = validated_data["start_at"] + (instance.end_at - instance.start_at)
                 
-        return super().update(instance, validated_data)
+        try:
+            return super().update(instance, validated_data)
+        except ValidationError as error:
+            raise serializers.ValidationError(error.message_dict)
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8,)
@@ -137,6 +150,108 @@ class RegisterEstablishmentSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["id"]
 
+class DashboardSummaryQuerySerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
+    period = serializers.ChoiceField(choices=["day", "week", "month"], default="day")
+
+class AvailableSlotsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField(required=False)
+    duration = serializers.IntegerField(required=False, min_value=5, max_value=24 * 60)
+
+    def validate(self, data):
+        data.setdefault("end", data["start"])
+
+        if data["end"] < data["start"]:
+            raise serializers.ValidationError({"end": "A data final deve ser igual ou posterior à data inicial"})
+        if (data["end"] - data["start"]).days > 31:
+            raise serializers.ValidationError({"end": "O intervalo máximo é de 31 dias"})
+        return data
+
+class AppointmentFilterSerializer(serializers.Serializer):
+    start_from = serializers.DateField(required=False)
+    start_to = serializers.DateField(required=False)
+    status = serializers.CharField(required=False)
+    payment_method = serializers.ChoiceField(choices=Appointment.Payment.choices, required=False)
+    location = serializers.IntegerField(required=False)
+
+    # ?status=SCHEDULED,CONFIRMED
+    def validate_status(self, value):
+        statuses = [status.strip().upper() for status in value.split(",") if status.strip()]
+        invalid = [status for status in statuses if status not in Appointment.Status.values]
+        if invalid:
+            raise serializers.ValidationError(f"Status inválido: {', '.join(invalid)}")
+        return statuses
+
+    def validate(self, data):
+        if data.get("start_from") and data.get("start_to") and data["start_to"] < data["start_from"]:
+            raise serializers.ValidationError({"start_to": "A data final deve ser igual ou posterior à data inicial"})
+        return data
+
+class ExportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+
+class AppointmentExportQuerySerializer(ExportQuerySerializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    def validate(self, data):
+        if data["end"] < data["start"]:
+            raise serializers.ValidationError({"end": "A data final deve ser igual ou posterior à data inicial"})
+        return data
+
+class CheckoutStatusQuerySerializer(serializers.Serializer):
+    # Seconds to hold the request while the session is still being created
+    wait = serializers.IntegerField(min_value=0, default=0)
+
+    def validate_wait(self, value):
+        return min(value, self.context.get("max_wait", settings.STRIPE_CHECKOUT_MAX_WAIT))
+
+class CustomerImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=["csv", "ndjson"], required=False)
+
+class BulkAppointmentCreateSerializer(serializers.Serializer):
+    customer_id = serializers.IntegerField()
+    start_at = serializers.DateTimeField()
+    end_at = serializers.DateTimeField(required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = serializers.ChoiceField(choices=Appointment.Payment.choices)
+    status = serializers.ChoiceField(choices=Appointment.Status.choices, default=Appointment.Status.SCHEDULED)
+    number_people = serializers.IntegerField(default=1)
+    observation = serializers.CharField(max_length=500, required=False, allow_null=True, allow_blank=True)
+
+    def validate(self, data):
+        if data.get("start_at") and data.get("end_at") and data["end_at"] <= data["start_at"]:
+            raise serializers.ValidationError({"end_at": "O horário final deve ser depois do horário inicial"})
+        return data
+
+class BulkAppointmentUpdateSerializer(BulkAppointmentCreateSerializer):
+    # Only the sent fields change, like a PATCH
+    id = serializers.IntegerField()
+    customer_id = serializers.IntegerField(required=False)
+    start_at = serializers.DateTimeField(required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    payment_method = serializers.ChoiceField(choices=Appointment.Payment.choices, required=False)
+    status = serializers.ChoiceField(choices=Appointment.Status.choices, required=False)
+    number_people = serializers.IntegerField(required=False)
+
+class BulkAppointmentSerializer(serializers.Serializer):
+    MAX_ITEMS = 500
+
+    create = BulkAppointmentCreateSerializer(many=True, required=False)
+    update = BulkAppointmentUpdateSerializer(many=True, required=False)
+    cancel = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, data):
+        total = sum(len(data.get(section, [])) for section in ("create", "update", "cancel"))
+
+        if not total:
+            raise serializers.ValidationError({"detail": "Envie ao menos um item em create, update ou cancel"})
+        if total > self.MAX_ITEMS:
+            raise serializers.ValidationError({"detail": f"Envie no máximo {self.MAX_ITEMS} itens por lote"})
+        return data
+
 class AuthPasswordResetSerializer(serializers.Serializer):
     email = serializers.EmailField(write_only=True)
 
@@ -0,0 +1,44 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from api_rest.models import Appointment
+
+# (column, lookup) of every exported row: one appointment per payment, LEFT JOINed in a single query
+COLUMNS = [
+    ("appointment_id", "id"),
+    ("start_at", "start_at"),
+    ("end_at", "end_at"),
+    ("status", "status"),
+    ("payment_method", "payment_method"),
+    ("price", "price"),
+    ("number_people", "number_people"),
+    ("customer_id", "customer_id"),
+    ("customer_name", "customer__full_name"),
+    ("customer_email", "customer__email"),
+    ("customer_phone", "customer__phone"),
+    ("payment_id", "userpayment__id"),
+    ("payment_price", "userpayment__price"),
+    ("payment_currency", "userpayment__currency"),
+    ("payment_has_paid", "userpayment__has_paid"),
+    ("payment_paid_at", "userpayment__paid_at"),
+    ("stripe_checkout_id", "userpayment__stripe_checkout_id"),
+]
+FIELDS = [column for column, _ in COLUMNS]
+CHUNK_SIZE = 2000
+
+
+def export_rows(establishment, start, end):
+    """Lazy rows of the appointments of `establishment` starting between two days (inclusive).
+
+    iterator() reads through a server-side cursor on Postgres, so memory use does not
+    depend on the range and the first rows are sent before the query finishes.
+    """
+    range_start = timezone.make_aware(datetime.combine(start, time.min))
+    range_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+
+    return (Appointment.objects
+            .filter(location=establishment, start_at__gte=range_start, start_at__lt=range_end)
+            .order_by("start_at", "id", "userpayment__id")
+            .values_list(*(lookup for _, lookup in COLUMNS))
+            .iterator(chunk_size=CHUNK_SIZE))
@@ -0,0 +1,196 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api_rest.models import Appointment, Customer
+from api_rest.services import rollups, slots
+from api_rest.services.intervals import IntervalIndex
+
+# Every column a bulk update may touch; bulk_update skips auto_now, so updated_at is set by hand
+UPDATE_FIELDS = ["customer", "start_at", "end_at", "price", "payment_method", "status",
+                 "number_people", "observation", "updated_at"]
+
+OVERLAP_ERROR = "Já existe um agendamento neste horário"
+
+
+class BulkError(Exception):
+    """Raised with the per-item errors, shaped like the request ({"create": [{...}, ...], ...})."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _default_end(start_at):
+    return start_at + timedelta(minutes=settings.APPOINTMENT_DEFAULT_DURATION_MINUTES)
+
+
+def _add_error(errors, section, index, field, message):
+    errors[section][index].setdefault(field, []).append(message)
+
+
+def _check_ids(user, update, cancel, errors):
+    """Load the appointments referenced by update/cancel in one query, flagging unknown or repeated ids."""
+    ids = [item["id"] for item in update] + list(cancel)
+    existing = Appointment.objects.filter(created_by=user).in_bulk(ids)
+
+    seen = set()
+    for section, section_ids in (("update", [item["id"] for item in update]), ("cancel", cancel)):
+        for index, pk in enumerate(section_ids):
+            if pk not in existing:
+                _add_error(errors, section, index, "id", "Agendamento não encontrado")
+            elif pk in seen:
+                _add_error(errors, section, index, "id", "Agendamento repetido no lote")
+            seen.add(pk)
+
+    return existing
+
+
+def _check_customers(user, create, update, errors):
+    """Resolve every customer_id of the batch in one query, scoped to the user."""
+    ids = {item["customer_id"] for item in create + update if "customer_id" in item}
+    customers = Customer.objects.filter(created_by=user).in_bulk(ids)
+
+    for section, items in (("create", create), ("update", update)):
+        for index, item in enumerate(items):
+            if "customer_id" in item and item["customer_id"] not in customers:
+                _add_error(errors, section, index, "customer_id", "Cliente não encontrado")
+
+    return customers
+
+
+def _check_overlaps(bookings, touched, errors):
+    """Validate the final state of the batch as a set: against each other and the stored bookings.
+
+    bookings is a list of (section, index, appointment). The stored active bookings
+    of the affected establishments are read once and indexed in memory; appointments
+    that the batch updates or cancels are left out since their new state is in bookings.
+    """
+    active = [(section, index, appointment) for section, index, appointment in bookings
+              if appointment.status != Appointment.Status.CANCELED and appointment.end_at > appointment.start_at]
+    if not active:
+        return
+
+    range_start = min(appointment.start_at for _, _, appointment in active)
+    range_end = max(appointment.end_at for _, _, appointment in active)
+    stored = (Appointment.objects
+              .filter(~Q(status=Appointment.Status.CANCELED),
+                      location_id__in={appointment.location_id for _, _, appointment in active},
+                      start_at__lt=range_end,
+                      end_at__gt=range_start)
+              .exclude(pk__in=touched)
+              .values_list("location_id", "start_at", "end_at"))
+
+    indexes = {}
+    for location_id, start_at, end_at in stored:
+        indexes.setdefault(location_id, IntervalIndex()).add(start_at, end_at)
+
+    for section, index, appointment in active:
+        booked = indexes.setdefault(appointment.location_id, IntervalIndex())
+        if booked.overlaps(appointment.start_at, appointment.end_at):
+            _add_error(errors, section, index, "start_at", OVERLAP_ERROR)
+        else:
+            booked.add(appointment.start_at, appointment.end_at)
+
+
+def apply_batch(user, establishment, create=(), update=(), cancel=()):
+    """Create, update and cancel appointments of `user` all or nothing.
+
+    Items are validated serializer data. Every reference is loaded up front with a
+    fixed number of queries and the writes are one bulk_create, one bulk_update and
+    one UPDATE inside a single transaction. Raises BulkError with per-item errors.
+    Returns {"created": [ids], "updated": [ids], "canceled": [ids]}.
+    """
+    create, update, cancel = list(create), list(update), list(cancel)
+    errors = {
+        "create": [{} for _ in create],
+        "update": [{} for _ in update],
+        "cancel": [{} for _ in cancel],
+    }
+
+    if create and establishment is None:
+        raise BulkError({"detail": "Cadastre um estabelecimento antes de criar agendamentos"})
+
+    existing = _check_ids(user, update, cancel, errors)
+    customers = _check_customers(user, create, update, errors)
+    now = timezone.now()
+
+    new_appointments = []
+    for item in create:
+        values = dict(item)
+        customer = customers.get(values.pop("customer_id"))
+        values.setdefault("end_at", _default_end(values["start_at"]))
+        new_appointments.append(Appointment(**values, customer=customer, location=establishment, created_by=user))
+
+    changed_appointments = []
+    before = {}
+    for index, item in enumerate(update):
+        appointment = existing.get(item["id"])
+        if appointment is None or errors["update"][index]:
+            changed_appointments.append(None)
+            continue
+
+        before[appointment.pk] = (rollups.bucket_of(appointment), appointment.start_at, appointment.end_at)
+        values = {field: value for field, value in item.items() if field != "id"}
+
+        # Rescheduling without an end_at keeps the appointment's duration, like a single PATCH
+        if "start_at" in values and "end_at" not in values:
+            if appointment.start_at and appointment.end_at:
+                values["end_at"] = values["start_at"] + (appointment.end_at - appointment.start_at)
+            else:
+                values["end_at"] = _default_end(values["start_at"])
+        if "customer_id" in values:
+            values["customer"] = customers[values.pop("customer_id")]
+
+        for field, value in values.items():
+            setattr(appointment, field, value)
+        appointment.updated_at = now
+
+        if appointment.start_at and appointment.end_at and appointment.end_at <= appointment.start_at:
+            _add_error(errors, "update", index, "end_at", "O horário final deve ser depois do horário inicial")
+        changed_appointments.append(appointment)
+
+    bookings = [("create", index, appointment) for index, appointment in enumerate(new_appointments)]
+    bookings += [("update", index, appointment) for index, appointment in enumerate(changed_appointments)
+                 if appointment and appointment.start_at and appointment.end_at]
+    _check_overlaps(bookings, [item["id"] for item in update] + cancel, errors)
+
+    if any(error for section in errors.values() for error in section):
+        raise BulkError({section: items for section, items in errors.items() if items})
+
+    try:
+        with transaction.atomic():
+            created = Appointment.objects.bulk_create(new_appointments, batch_size=500)
+            Appointment.objects.bulk_update(changed_appointments, UPDATE_FIELDS, batch_size=500)
+
+            to_cancel = Appointment.objects.filter(pk__in=cancel).exclude(status=Appointment.Status.CANCELED)
+            canceled = list(to_cancel.values_list("location_id", "start_at", "end_at"))
+            rollups.update_appointments(to_cancel, status=Appointment.Status.CANCELED, updated_at=now)
+
+            # The bulk writes skip signals: keep the dashboard rollup and the slot cache in sync here
+            moves = [(None, rollups.bucket_of(appointment)) for appointment in created]
+            moves += [(before[appointment.pk][0], rollups.bucket_of(appointment)) for appointment in changed_appointments]
+            rollups.move_many(moves)
+
+            for appointment in created:
+                slots.invalidate(appointment.location_id, appointment.start_at, appointment.end_at)
+            for appointment in changed_appointments:
+                bucket, start_at, end_at = before[appointment.pk]
+                slots.invalidate(bucket.establishment_id if bucket else None, start_at, end_at)
+                slots.invalidate(appointment.location_id, appointment.start_at, appointment.end_at)
+            for location_id, start_at, end_at in canceled:
+                slots.invalidate(location_id, start_at, end_at)
+    except IntegrityError as error:
+        # Postgres appointment_no_overlap constraint: a concurrent request booked one of the slots
+        if "appointment_no_overlap" in str(error):
+            raise BulkError({"detail": OVERLAP_ERROR}) from error
+        raise
+
+    return {
+        "created": [appointment.pk for appointment in created],
+        "updated": [appointment.pk for appointment in changed_appointments],
+        "canceled": list(cancel),
+    }
@@ -0,0 +1,235 @@
+import asyncio
+import os
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api_rest.models import UserPayment
+from api_rest.services import stripe_gateway, stripe_status
+from api_rest.services.send_email import send_email
+
+DOMAIN = os.getenv("DOMAIN")
+
+# A claimed row is hidden from other workers for this long; the idempotency key
+# makes a second attempt after an expired lease return the same session
+CLAIM_LEASE = timedelta(minutes=2)
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 600
+POLL_INTERVAL = 0.5
+
+STATUS_FIELDS = ["token", "appointment_id", "checkout_status", "checkout_url", "has_paid", "updated_at"]
+
+CREATED_MESSAGE = "Pagamento enviado com sucesso. Solicite ao seu cliente que verifique sua caixa de email"
+ACCEPTED_MESSAGE = "Pagamento em processamento. O link será enviado ao cliente por email em instantes"
+
+
+def amount_cents(price):
+    return int((Decimal(str(price)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def session_params(appointment, unit_amount):
+    return {
+        "mode": "payment",
+        "line_items": [
+            {
+                "price_data": {
+                    "currency": "brl",
+                    "product_data": {
+                        "name": f"Reserva em {appointment.location.name} em nome de {appointment.customer.full_name}",
+                    },
+                    "unit_amount": unit_amount,
+                },
+                "quantity": 1,
+            }
+        ],
+        "success_url": f"{DOMAIN}/api/success",
+        "cancel_url": f"{DOMAIN}/api/cancel",
+        "payment_intent_data": {
+            "transfer_data": {"destination": appointment.location.stripe_account_id}
+        },
+    }
+
+
+def blocked_reason(appointment):
+    """Message telling why `appointment` cannot be sent to payment, or None."""
+    integration = stripe_status.integration_status(appointment.location)["code"]
+    if integration == stripe_status.DISCONNECTED:
+        return "Sua conta não está integrada com a Stripe, acesse configurações e clique em integrar com a stripe"
+    if integration == stripe_status.PENDING:
+        return "Sua conta esta pendente de verificação pela de identidade pela Stripe, pode levar até 48h"
+
+    # A failed async attempt does not block sending the appointment again
+    payments = UserPayment.objects.filter(appointment=appointment).exclude(
+        checkout_status=UserPayment.CheckoutStatus.FAILED)
+    if payments.exists():
+        return "este agendamento ja foi enviado para pagamento. Solicite ao cliente para verificar sua caixa de email"
+    return None
+
+
+def accepted_body(payment, status_url):
+    return {
+        "message": ACCEPTED_MESSAGE,
+        "token": str(payment.token),
+        "status": payment.checkout_status,
+        "status_url": status_url,
+    }
+
+
+def status_body(row):
+    return {
+        "token": str(row["token"]),
+        "appointment_id": row["appointment_id"],
+        "status": row["checkout_status"],
+        "checkout_url": row["checkout_url"] or None,
+        "has_paid": row["has_paid"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def record_session(appointment, session, unit_amount):
+    """Save the payment of a session created inline and email its link to the customer."""
+    payment = UserPayment.objects.create(
+        customer=appointment.customer,
+        appointment=appointment,
+        stripe_customer_id="",
+        stripe_checkout_id=session["id"],
+        stripe_product_id="",
+        amount_cents=unit_amount,
+        price=appointment.price,
+        currency="brl",
+        has_paid=False,
+        establishment=appointment.location,
+        checkout_url=session["url"],
+    )
+    send_email(session["url"], appointment.id)
+    return payment
+
+
+def idempotency_key(payment):
+    return f"checkout-{payment.token}"
+
+
+def reserve(appointment):
+    """Record the payment as PENDING; process_checkout_sessions creates its Stripe session."""
+    return UserPayment.objects.create(
+        customer=appointment.customer,
+        appointment=appointment,
+        stripe_customer_id="",
+        stripe_checkout_id="",
+        stripe_product_id="",
+        amount_cents=amount_cents(appointment.price),
+        price=appointment.price,
+        currency="brl",
+        has_paid=False,
+        establishment=appointment.location,
+        checkout_status=UserPayment.CheckoutStatus.PENDING,
+    )
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        payments = list(
+            UserPayment.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("appointment__location", "appointment__customer")
+            .filter(checkout_status=UserPayment.CheckoutStatus.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        UserPayment.objects.filter(pk__in=[payment.pk for payment in payments]).update(next_attempt_at=now + CLAIM_LEASE)
+    return payments
+
+
+def mark_ready(payment, session):
+    payment.stripe_checkout_id = session["id"]
+    payment.checkout_url = session["url"]
+    payment.checkout_status = UserPayment.CheckoutStatus.READY
+    payment.attempts += 1
+    payment.last_error = ""
+
+    with transaction.atomic():
+        payment.save(update_fields=["stripe_checkout_id", "checkout_url", "checkout_status", "attempts",
+                                    "last_error", "updated_at"])
+        send_email(payment.checkout_url, payment.appointment_id)
+
+
+def mark_failed(payment, error, retry=True):
+    payment.attempts += 1
+    payment.last_error = repr(error)
+
+    if not retry or payment.attempts >= settings.STRIPE_CHECKOUT_MAX_ATTEMPTS:
+        payment.checkout_status = UserPayment.CheckoutStatus.FAILED
+    else:
+        payment.next_attempt_at = timezone.now() + retry_delay(payment.attempts)
+
+    payment.save(update_fields=["checkout_status", "attempts", "last_error", "next_attempt_at", "updated_at"])
+
+
+def postpone(payment, seconds):
+    # The open circuit refused the call before it reached Stripe: an outage longer than
+    # the retry budget must not fail the reservation, so this is not an attempt
+    payment.next_attempt_at = timezone.now() + timedelta(seconds=seconds)
+    payment.save(update_fields=["next_attempt_at", "updated_at"])
+
+
+def process_pending(batch_size=20):
+    """Create the Stripe sessions of up to batch_size due reservations. Returns (created, failed)."""
+    created = failed = 0
+
+    for payment in claim_batch(batch_size):
+        params = session_params(payment.appointment, payment.amount_cents)
+        try:
+            session = stripe_gateway.create_checkout_session(params, idempotency_key=idempotency_key(payment))
+        except stripe_gateway.CircuitOpen:
+            postpone(payment, stripe_gateway.get_breaker().retry_after)
+            failed += 1
+        except stripe_gateway.StripeUnavailable as error:
+            mark_failed(payment, error)
+            failed += 1
+        except stripe.StripeError as error:
+            # Stripe refused the request itself: sending it again would get the same answer
+            mark_failed(payment, error, retry=False)
+            failed += 1
+        else:
+            mark_ready(payment, session)
+            created += 1
+
+    return created, failed
+
+
+def wait_for_status(payments, token, timeout):
+    """Status fields of the payment, polling for up to `timeout` seconds while it is PENDING.
+
+    Returns None when `payments` has no row with that token.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        row = payments.filter(token=token).values(*STATUS_FIELDS).first()
+        if row is None or row["checkout_status"] != UserPayment.CheckoutStatus.PENDING:
+            return row
+        if time.monotonic() + POLL_INTERVAL > deadline:
+            return row
+        time.sleep(POLL_INTERVAL)
+
+
+async def await_for_status(payments, token, timeout):
+    """wait_for_status for async views: the wait yields the event loop instead of a thread."""
+    deadline = time.monotonic() + timeout
+    while True:
+        row = await payments.filter(token=token).values(*STATUS_FIELDS).afirst()
+        if row is None or row["checkout_status"] != UserPayment.CheckoutStatus.PENDING:
+            return row
+        if time.monotonic() + POLL_INTERVAL > deadline:
+            return row
+        await asyncio.sleep(POLL_INTERVAL)
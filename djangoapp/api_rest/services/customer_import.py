@@ -0,0 +1,86 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from api_rest.models import Customer
+from api_rest.services.streaming import chunked
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+EXPORT_FIELDS = ["id", "full_name", "phone", "email", "created_at"]
+
+
+def clean_record(record):
+    """Stripped (full_name, phone, email) of an import row, or a dict of field errors.
+
+    The email is kept as typed, like the create endpoint saves it; duplicates are found
+    by its lowercase form.
+    """
+    if record is None:
+        return {"detail": "Linha inválida"}
+
+    full_name = str(record.get("full_name") or "").strip()
+    phone = str(record.get("phone") or "").strip()
+    email = str(record.get("email") or "").strip()
+
+    errors = {}
+    for field, value, max_length in (("full_name", full_name, 255), ("phone", phone, 50), ("email", email, 100)):
+        if not value:
+            errors[field] = "Campo obrigatório"
+        elif len(value) > max_length:
+            errors[field] = f"Máximo de {max_length} caracteres"
+
+    if "email" not in errors:
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors["email"] = "Email inválido"
+
+    return errors or (full_name, phone, email)
+
+
+def import_customers(user, records, chunk_size=None):
+    """Insert the (line_number, record) pairs of an upload as customers of `user`, chunk by chunk.
+
+    A row is skipped as duplicate when its email (in any case) or phone already belongs
+    to a customer of the user, or to an earlier row of the same file. Each chunk costs one lookup
+    query and one bulk_create.
+    """
+    report = {"created": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    seen_emails, seen_phones = set(), set()
+
+    for chunk in chunked(records, chunk_size or CHUNK_SIZE):
+        rows = []
+        for line_number, record in chunk:
+            cleaned = clean_record(record)
+            if isinstance(cleaned, dict):
+                report["invalid"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"line": line_number, "errors": cleaned})
+                continue
+            rows.append(cleaned)
+
+        emails = {email.lower() for _, _, email in rows}
+        phones = {phone for _, phone, _ in rows}
+        # Lower("email") matches customer_owner_lower_email_idx
+        for email, phone in (Customer.objects
+                             .alias(email_lower=Lower("email"))
+                             .filter(Q(email_lower__in=emails) | Q(phone__in=phones), created_by=user)
+                             .values_list("email", "phone")):
+            seen_emails.add(email.lower())
+            seen_phones.add(phone)
+
+        customers = []
+        for full_name, phone, email in rows:
+            if email.lower() in seen_emails or phone in seen_phones:
+                report["duplicates"] += 1
+                continue
+            seen_emails.add(email.lower())
+            seen_phones.add(phone)
+            customers.append(Customer(full_name=full_name, phone=phone, email=email, created_by=user))
+
+        Customer.objects.bulk_create(customers)
+        report["created"] += len(customers)
+
+    return report
@@ -0,0 +1,108 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from api_rest.models import OutboundEmail
+
+# A claimed row is hidden from other workers for this long, so a worker that
+# dies mid-batch only delays its emails instead of losing them.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def queue_email(subject, body, to, from_email, content_subtype="html"):
+    """Persist an email to be delivered by the send_queued_emails worker."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email,
+        content_subtype=content_subtype,
+    )
+
+
+def retry_delay(attempts):
+    # Exponential backoff with jitter: ~30s, 1min, 2min, 4min ... capped
+    base = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    delay = min(base, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=now + CLAIM_LEASE)
+    return emails
+
+
+def build_message(outbound, connection):
+    message = EmailMessage(
+        subject=outbound.subject,
+        body=outbound.body,
+        from_email=outbound.from_email,
+        to=outbound.to,
+        connection=connection,
+    )
+    message.content_subtype = outbound.content_subtype
+    return message
+
+
+def mark_sent(outbound):
+    outbound.status = OutboundEmail.Status.SENT
+    outbound.attempts += 1
+    outbound.sent_at = timezone.now()
+    outbound.last_error = ""
+    outbound.save(update_fields=["status", "attempts", "sent_at", "last_error"])
+
+
+def mark_failed(outbound, error):
+    outbound.attempts += 1
+    outbound.last_error = repr(error)
+
+    if outbound.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        outbound.status = OutboundEmail.Status.FAILED
+    else:
+        outbound.next_attempt_at = timezone.now() + retry_delay(outbound.attempts)
+
+    outbound.save(update_fields=["status", "attempts", "last_error", "next_attempt_at"])
+
+
+def deliver_batch(batch_size=50):
+    """Send up to batch_size due emails over one backend connection. Returns (sent, failed)."""
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+
+    try:
+        connection.open()
+    except Exception as error:
+        for outbound in emails:
+            mark_failed(outbound, error)
+        return 0, len(emails)
+
+    try:
+        for outbound in emails:
+            try:
+                connection.send_messages([build_message(outbound, connection)])
+            except Exception as error:
+                mark_failed(outbound, error)
+                failed += 1
+            else:
+                mark_sent(outbound)
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from api_rest.models import Establishment
+
+CACHE_TIMEOUT = 60 * 15
+
+
+def cache_key(user_id):
+    return f"establishments:{user_id}"
+
+
+def user_establishments(user):
+    """Establishments of `user` ordered by id.
+
+    Memoized on the user object for the rest of the request and in the Django cache
+    across requests; Establishment signals drop the cached list on every write.
+    """
+    establishments = getattr(user, "_establishments", None)
+    if establishments is not None:
+        return establishments
+
+    establishments = cache.get(cache_key(user.pk))
+    if establishments is None:
+        establishments = list(Establishment.objects.filter(owner=user).order_by("pk"))
+        cache.set(cache_key(user.pk), establishments, CACHE_TIMEOUT)
+
+    user._establishments = establishments
+    return establishments
+
+
+def user_establishment(user, fresh=False):
+    """The first establishment of `user`, like Establishment.objects.filter(owner=user).first().
+
+    fresh=True reads the row from the database: use it before saving the establishment.
+    """
+    if fresh:
+        return Establishment.objects.filter(owner=user).order_by("pk").first()
+
+    establishments = user_establishments(user)
+    return establishments[0] if establishments else None
+
+
+def get_user_establishment(user, pk=None, fresh=False, **filters):
+    """get_object_or_404(Establishment, owner=user, pk=pk, **filters) served from the cache.
+
+    Without pk the user must own exactly one establishment. The cached rows may be stale
+    in other worker processes, so write paths pass fresh=True to read the database instead:
+    a full save() of a cached instance would write its old columns back.
+    """
+    candidates = Establishment.objects.filter(owner=user).order_by("pk") if fresh else user_establishments(user)
+    establishments = [
+        establishment for establishment in candidates
+        if (pk is None or str(establishment.pk) == str(pk))
+        and all(getattr(establishment, field) == value for field, value in filters.items())
+    ]
+    if len(establishments) != 1:
+        raise Http404("Estabelecimento não encontrado")
+    return establishments[0]
+
+
+def invalidate(*user_ids):
+    keys = [cache_key(user_id) for user_id in user_ids if user_id]
+    if not keys:
+        return
+
+    cache.delete_many(keys)
+    # Again after commit, in case a concurrent request cached the old rows before we committed
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for a burst of concurrent connections (benchmark_stripe_concurrency)
+    request_queue_size = 256
+
+
+class FakeStripeServer:
+    """Local HTTP server answering like the Stripe API, for exercising the real client.
+
+    Used by the tests and by benchmark_stripe_concurrency; nothing here talks to Stripe.
+
+    Queue replies with reply(status, body, delay); when the queue is empty every
+    request gets `default`. Each request is recorded as a dict with method, path,
+    headers, body and the client port, which tells whether a connection was reused.
+    """
+
+    def __init__(self, default=None):
+        self.default = default or (200, {"id": "obj_fake", "object": "fake"}, 0)
+        self.replies = []
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reply(self, status, body, delay=0):
+        self.replies.append((status, body, delay))
+
+    def error(self, status, message="Erro", error_type="api_error"):
+        self.reply(status, {"error": {"type": error_type, "message": message}})
+
+    def _next(self):
+        with self._lock:
+            return self.replies.pop(0) if self.replies else self.default
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                fake.requests.append({
+                    "method": self.command,
+                    "path": self.path,
+                    "headers": dict(self.headers),
+                    "body": self.rfile.read(length).decode(),
+                    "port": self.client_address[1],
+                })
+
+                status, body, delay = fake._next()
+                if delay:
+                    time.sleep(delay)
+
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (read timeout) before the reply
+                    self.close_connection = True
+
+            do_GET = do_POST = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,29 @@
+from bisect import bisect_left, insort
+
+
+class IntervalIndex:
+    """Sorted set of non-overlapping half-open [start, end) intervals.
+
+    Because the intervals never overlap, sorting them by start also sorts them by
+    end, so an overlap test only needs to look at the last interval that starts
+    before the candidate ends: a single bisect.
+    """
+
+    def __init__(self, intervals=()):
+        self._intervals = []
+        for start, end in sorted(intervals):
+            self.add(start, end)
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def overlaps(self, start, end):
+        if end <= start:
+            return False
+        position = bisect_left(self._intervals, (end,))
+        return position > 0 and self._intervals[position - 1][1] > start
+
+    def add(self, start, end):
+        # Empty ranges occupy no time and would break the ordering invariant
+        if end > start:
+            insort(self._intervals, (start, end))
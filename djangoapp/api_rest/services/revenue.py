@@ -0,0 +1,105 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from api_rest.models import EstablishmentRevenue, EstablishmentRevenueDay, UserPayment
+
+
+def _increment(model, lookup, price):
+    changes = {"paid_count": F("paid_count") + 1, "paid_total": F("paid_total") + price}
+
+    if model.objects.filter(**lookup).update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, paid_count=1, paid_total=price)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_payment(establishment_id, price, paid_at):
+    """Add one paid UserPayment to the running totals of its establishment."""
+    if establishment_id is None:
+        return
+
+    _increment(EstablishmentRevenue, {"establishment_id": establishment_id}, price)
+    _increment(
+        EstablishmentRevenueDay,
+        {"establishment_id": establishment_id, "day": timezone.localdate(paid_at)},
+        price,
+    )
+
+
+def owner_total(user):
+    total = (EstablishmentRevenue.objects
+             .filter(establishment__owner=user)
+             .aggregate(total=Sum("paid_total")))["total"]
+    return total or Decimal("0")
+
+
+def expected_day_totals():
+    """{(establishment_id, day): (count, total)} computed from UserPayment itself."""
+    rows = (UserPayment.objects
+            .filter(has_paid=True, establishment__isnull=False)
+            .annotate(day=TruncDate(Coalesce("paid_at", "created_at")))
+            .values("establishment_id", "day")
+            .annotate(count=Count("id"), total=Sum("price")))
+
+    return {(row["establishment_id"], row["day"]): (row["count"], row["total"]) for row in rows}
+
+
+def sum_by_establishment(day_totals):
+    totals = {}
+    for (establishment_id, _), (count, total) in day_totals.items():
+        current_count, current_total = totals.get(establishment_id, (0, Decimal("0")))
+        totals[establishment_id] = (current_count + count, current_total + total)
+    return totals
+
+
+def find_drift():
+    """List of (establishment_id, day, stored, expected) for every bucket that does not match
+    UserPayment. day is None for the establishment's running total."""
+    expected_days = expected_day_totals()
+    stored_days = {
+        (establishment_id, day): (count, total)
+        for establishment_id, day, count, total in
+        EstablishmentRevenueDay.objects.values_list("establishment_id", "day", "paid_count", "paid_total")
+    }
+    expected = {(establishment_id, None): value for establishment_id, value in sum_by_establishment(expected_days).items()}
+    stored = {
+        (establishment_id, None): (count, total)
+        for establishment_id, count, total in
+        EstablishmentRevenue.objects.values_list("establishment_id", "paid_count", "paid_total")
+    }
+    expected.update(expected_days)
+    stored.update(stored_days)
+
+    empty = (0, Decimal("0"))
+    drift = []
+    for key in sorted(expected.keys() | stored.keys(), key=lambda key: (key[0], str(key[1] or ""))):
+        if stored.get(key, empty) != expected.get(key, empty):
+            drift.append((*key, stored.get(key, empty), expected.get(key, empty)))
+    return drift
+
+
+@transaction.atomic
+def rebuild_totals():
+    expected = expected_day_totals()
+    totals = sum_by_establishment(expected)
+
+    EstablishmentRevenueDay.objects.all().delete()
+    EstablishmentRevenue.objects.all().delete()
+
+    EstablishmentRevenueDay.objects.bulk_create([
+        EstablishmentRevenueDay(establishment_id=establishment_id, day=day, paid_count=count, paid_total=total)
+        for (establishment_id, day), (count, total) in expected.items()
+    ])
+    EstablishmentRevenue.objects.bulk_create([
+        EstablishmentRevenue(establishment_id=establishment_id, paid_count=count, paid_total=total)
+        for establishment_id, (count, total) in totals.items()
+    ])
@@ -0,0 +1,194 @@
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api_rest.models import Appointment, AppointmentDailySummary
+
+# The Appointment columns that decide which rollup row an appointment counts in
+BUCKET_FIELDS = ("location_id", "start_at", "status", "payment_method", "price", "number_people")
+
+Bucket = namedtuple("Bucket", ["establishment_id", "day", "status", "payment_method", "price", "number_people"])
+
+
+def make_bucket(location_id, start_at, status, payment_method, price, number_people):
+    if location_id is None or start_at is None:
+        return None
+    return Bucket(location_id, timezone.localdate(start_at), status, payment_method, Decimal(str(price)), number_people)
+
+
+def bucket_of(appointment):
+    return make_bucket(*(getattr(appointment, field) for field in BUCKET_FIELDS))
+
+
+def _add(establishment_id, day, status, payment_method, count, people, total, create=True):
+    lookup = {
+        "establishment_id": establishment_id,
+        "day": day,
+        "status": status,
+        "payment_method": payment_method,
+    }
+    changes = {
+        "appointment_count": F("appointment_count") + count,
+        "number_people": F("number_people") + people,
+        "price_total": F("price_total") + total,
+    }
+
+    if AppointmentDailySummary.objects.filter(**lookup).update(**changes) or not create:
+        return
+
+    try:
+        with transaction.atomic():
+            AppointmentDailySummary.objects.create(
+                **lookup,
+                appointment_count=count,
+                number_people=people,
+                price_total=total,
+            )
+    except IntegrityError:
+        AppointmentDailySummary.objects.filter(**lookup).update(**changes)
+
+
+def _apply(bucket, sign):
+    # Taking an appointment out never creates a row: when there is none the establishment
+    # is being deleted (its rollup rows may go before its appointments in the cascade)
+    _add(bucket.establishment_id, bucket.day, bucket.status, bucket.payment_method,
+         sign, sign * bucket.number_people, sign * bucket.price, create=sign > 0)
+
+
+def move(before, after):
+    """Move one appointment from the rollup row of `before` to the one of `after` (either may be None)."""
+    if before == after:
+        return
+    if before:
+        _apply(before, -1)
+    if after:
+        _apply(after, 1)
+
+
+def move_many(moves):
+    """move() for many (before, after) pairs, with a single write per rollup row touched."""
+    deltas = {}
+    for before, after in moves:
+        if before == after:
+            continue
+        for bucket, sign in ((before, -1), (after, 1)):
+            if bucket:
+                row = bucket[:4]
+                count, people, total = deltas.get(row, (0, 0, Decimal("0")))
+                deltas[row] = (count + sign, people + sign * bucket.number_people, total + sign * bucket.price)
+
+    for row, delta in deltas.items():
+        if any(delta):
+            _add(*row, *delta, create=delta[0] > 0)
+
+
+def update_appointments(queryset, **changes):
+    """queryset.update(**changes) that also keeps the rollup in sync, for write paths that bypass save()."""
+    rows = list(queryset.values_list("pk", *BUCKET_FIELDS))
+    updated = queryset.model.objects.filter(pk__in=[row[0] for row in rows]).update(**changes)
+
+    moves = []
+    for pk, *values in rows:
+        after = dict(zip(BUCKET_FIELDS, values))
+        after.update({field: value for field, value in changes.items() if field in after})
+        moves.append((make_bucket(*values), make_bucket(**after)))
+    move_many(moves)
+
+    return updated
+
+
+@transaction.atomic
+def rebuild_rollups():
+    rows = (Appointment.objects
+            .filter(start_at__isnull=False)
+            .annotate(day=TruncDate("start_at"))
+            .values("location_id", "day", "status", "payment_method")
+            .annotate(count=Count("id"), people=Sum("number_people"), total=Sum("price")))
+
+    AppointmentDailySummary.objects.all().delete()
+    AppointmentDailySummary.objects.bulk_create([
+        AppointmentDailySummary(
+            establishment_id=row["location_id"],
+            day=row["day"],
+            status=row["status"],
+            payment_method=row["payment_method"],
+            appointment_count=row["count"],
+            number_people=row["people"],
+            price_total=row["total"],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+def period_range(day, period):
+    """First and last day of the day/week/month that contains `day`."""
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == "month":
+        start = day.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    return day, day
+
+
+def _money(value):
+    return "{:.2f}".format(value or 0)
+
+
+def summarize(owner, start, end):
+    """Dashboard numbers for the establishments of `owner` between two days, read from the rollup only."""
+    rows = list(AppointmentDailySummary.objects
+                .filter(establishment__owner=owner, day__range=(start, end))
+                .values("day", "status", "payment_method")
+                .annotate(count=Sum("appointment_count"), people=Sum("number_people"), total=Sum("price_total"))
+                .order_by("day"))
+
+    by_status = {value: 0 for value in Appointment.Status.values}
+    payment_methods = {value: {"appointments": 0, "revenue": Decimal("0")} for value in Appointment.Payment.values}
+    days = {}
+    revenue = Decimal("0")
+    people = 0
+
+    for row in rows:
+        by_status[row["status"]] = by_status.get(row["status"], 0) + row["count"]
+        day = days.setdefault(row["day"], {"appointments": 0, "revenue": Decimal("0"), "number_people": 0})
+        day["appointments"] += row["count"]
+
+        # Canceled appointments are counted but bring no revenue or people
+        if row["status"] == Appointment.Status.CANCELED:
+            continue
+
+        method = payment_methods.setdefault(row["payment_method"], {"appointments": 0, "revenue": Decimal("0")})
+        method["appointments"] += row["count"]
+        method["revenue"] += row["total"]
+        day["revenue"] += row["total"]
+        day["number_people"] += row["people"]
+        revenue += row["total"]
+        people += row["people"]
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "appointments": {"total": sum(by_status.values()), "by_status": by_status},
+        "revenue": _money(revenue),
+        "number_people": people,
+        "payment_methods": {
+            method: {"appointments": values["appointments"], "revenue": _money(values["revenue"])}
+            for method, values in payment_methods.items()
+        },
+        "days": [
+            {
+                "date": day.isoformat(),
+                "appointments": values["appointments"],
+                "revenue": _money(values["revenue"]),
+                "number_people": values["number_people"],
+            }
+            for day, values in days.items()
+        ],
+    }
@@ -0,0 +1,86 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from api_rest.models import Appointment
+
+# Formats accepted by ?q= when the user is looking for a day or a month
+DAY_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+MONTH_FORMATS = ("%Y-%m", "%m/%Y")
+
+
+def _next_month(value):
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def parse_date_range(q):
+    """Turn a date typed in the search box into a [start, end) range of aware datetimes."""
+    q = q.strip()
+
+    for date_format in DAY_FORMATS:
+        try:
+            day = datetime.strptime(q, date_format)
+        except ValueError:
+            continue
+        start = timezone.make_aware(day)
+        return start, timezone.make_aware(day + timedelta(days=1))
+
+    for date_format in MONTH_FORMATS:
+        try:
+            month = datetime.strptime(q, date_format)
+        except ValueError:
+            continue
+        return timezone.make_aware(month), timezone.make_aware(_next_month(month))
+
+    return None
+
+
+def search_customers(queryset, q):
+    # On Postgres each column has a pg_trgm GIN index over UPPER(column), which is
+    # exactly the expression Django emits for icontains (see migration 0009).
+    return queryset.filter(
+        Q(full_name__icontains=q) |
+        Q(phone__icontains=q) |
+        Q(email__icontains=q)
+    )
+
+
+def search_appointments(queryset, q):
+    date_range = parse_date_range(q)
+    if date_range:
+        start, end = date_range
+        return queryset.filter(start_at__gte=start, start_at__lt=end)
+
+    # Match the status against the choices in Python so the database gets an
+    # equality test instead of a LIKE over every row.
+    term = q.strip().lower()
+    statuses = [
+        value for value, label in Appointment.Status.choices
+        if term and (term in value.lower() or term in str(label).lower())
+    ]
+
+    condition = Q(customer__phone__icontains=q)
+    if statuses:
+        condition |= Q(status__in=statuses)
+    return queryset.filter(condition)
+
+
+def filter_appointments(queryset, start_from=None, start_to=None, status=None, payment_method=None, location=None):
+    """Structured ?start_from=&start_to=&status=&payment_method=&location= filters.
+
+    Days become a half-open [start, end) range on the raw start_at column, and statuses an
+    IN list, so together with created_by they map onto appointment_status_start_idx
+    and appointment_owner_start_idx: a one-week calendar only reads that week's rows.
+    """
+    if start_from:
+        queryset = queryset.filter(start_at__gte=timezone.make_aware(datetime.combine(start_from, time.min)))
+    if start_to:
+        queryset = queryset.filter(start_at__lt=timezone.make_aware(datetime.combine(start_to + timedelta(days=1), time.min)))
+    if status:
+        queryset = queryset.filter(status__in=status)
+    if payment_method:
+        queryset = queryset.filter(payment_method=payment_method)
+    if location:
+        queryset = queryset.filter(location_id=location)
+    return queryset
@@ -1,8 +1,8 @@
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.conf import settings
-from django.core.mail import EmailMessage
 from api_rest.models import Appointment
+from api_rest.services.email_outbox import queue_email
 
 # Lembrete: Transformar em classe
 
@@ -24,14 +24,14 @@ def send_email(link_stripe, appointment_id):
     appointment = get_appointment(appointment_id)
 
     html_appointment = create_template_stripe(link_stripe, appointment)
-    email = EmailMessage(
+
+    # Only queued here, the send_queued_emails worker talks to the SMTP server
+    queue_email(
         subject=f"Reserva {appointment.location.name} cliente {appointment.customer}",
         from_email="smart.voucher@globalhost.app.br",
         body=html_appointment,
         to=[appointment.customer.email],
     )
-    email.content_subtype = "html"
-    email.send()
 
     return "Sucessful"
 
@@ -47,14 +47,12 @@ def create_template_reset_password(link_change_password):
 def send_email_reset_password(link_change_password, user):
     html_reset_password = create_template_reset_password(link_change_password)
     print(link_change_password)
-    email = EmailMessage(
+    queue_email(
         subject=f"Recuperação de senha",
         from_email="smart.voucher@globalhost.app.br",
         body=html_reset_password,
         to=[user.email],
     )
-    email.content_subtype = "html"
-    email.send()
     
 
 
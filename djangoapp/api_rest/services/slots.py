@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api_rest.models import Appointment
+
+
+def cache_key(establishment_id, day):
+    return f"slots:{establishment_id}:{day.isoformat()}"
+
+
+def days_between(start, end):
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+def opening_window(establishment, day):
+    start = timezone.make_aware(datetime.combine(day, establishment.opens_at))
+    end = timezone.make_aware(datetime.combine(day, establishment.closes_at))
+    return start, end
+
+
+def sweep(window_start, window_end, booked):
+    """Free gaps of [window_start, window_end) given booked intervals sorted by start."""
+    free = []
+    cursor = window_start
+
+    for start, end in booked:
+        if start >= window_end:
+            break
+        if end <= cursor:
+            continue
+        if start > cursor:
+            free.append((cursor, start))
+        cursor = max(cursor, end)
+
+    if cursor < window_end:
+        free.append((cursor, window_end))
+    return free
+
+
+def free_intervals(establishment, days):
+    """{day: [(start, end), ...]} of the free time in the opening hours of each day.
+
+    Cached per establishment-day; the cached entry remembers the opening hours it
+    was computed for, so changing them is picked up without explicit invalidation.
+    """
+    hours = (establishment.opens_at, establishment.closes_at)
+    keys = {day: cache_key(establishment.pk, day) for day in days}
+    cached = cache.get_many(keys.values())
+
+    result = {}
+    missing = []
+    for day, key in keys.items():
+        entry = cached.get(key)
+        if entry and entry["hours"] == hours:
+            result[day] = entry["free"]
+        else:
+            missing.append(day)
+
+    if missing:
+        windows = {day: opening_window(establishment, day) for day in missing}
+        range_start = min(start for start, _ in windows.values())
+        range_end = max(end for _, end in windows.values())
+
+        # One query on appointment_slot_idx for every missing day at once
+        booked = list(Appointment.objects
+                      .filter(~Q(status=Appointment.Status.CANCELED),
+                              location=establishment,
+                              start_at__lt=range_end,
+                              end_at__gt=range_start)
+                      .order_by("start_at")
+                      .values_list("start_at", "end_at"))
+
+        fresh = {}
+        for day, (window_start, window_end) in windows.items():
+            result[day] = sweep(window_start, window_end, booked)
+            fresh[keys[day]] = {"hours": hours, "free": result[day]}
+        cache.set_many(fresh, settings.SLOTS_CACHE_TIMEOUT)
+
+    return result
+
+
+def available_slots(establishment, start_day, end_day, duration):
+    """{day: [(start, end), ...]} of bookable slots of `duration`, stepping by the establishment slot size."""
+    step = timedelta(minutes=establishment.slot_minutes)
+    now = timezone.now()
+
+    slots = {}
+    for day, free in sorted(free_intervals(establishment, days_between(start_day, end_day)).items()):
+        slots[day] = []
+        for free_start, free_end in free:
+            slot_start = free_start
+            while slot_start + duration <= free_end:
+                if slot_start >= now:
+                    slots[day].append((slot_start, slot_start + duration))
+                slot_start += step
+    return slots
+
+
+def invalidate(establishment_id, *moments):
+    """Drop the cached days touched by an appointment (pass its start_at and end_at)."""
+    days = {timezone.localdate(moment) for moment in moments if moment}
+    if not (establishment_id and days):
+        return
+
+    keys = [cache_key(establishment_id, day) for day in days]
+    cache.delete_many(keys)
+    # Again after commit, in case a concurrent reader cached the day before we committed
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,86 @@
+import codecs
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+def ndjson_lines(fields, rows):
+    for row in rows:
+        yield json.dumps({field: _plain(value) for field, value in zip(fields, row)}, ensure_ascii=False) + "\n"
+
+
+def stream_response(fields, rows, file_format, filename):
+    """StreamingHttpResponse writing `rows` (tuples ordered like `fields`) as CSV or NDJSON.
+
+    `rows` should be lazy (e.g. values_list().iterator()) so nothing is held in memory.
+    """
+    lines = csv_lines(fields, rows) if file_format == "csv" else ndjson_lines(fields, rows)
+    response = StreamingHttpResponse(lines, content_type=FORMATS[file_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+def guess_format(upload, file_format=None):
+    if file_format:
+        return file_format
+    return "ndjson" if upload.name.lower().endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def read_records(upload, file_format):
+    """Yield (line_number, dict) from an uploaded CSV or NDJSON file without reading it whole.
+
+    Malformed NDJSON lines are yielded as (line_number, None).
+    """
+    lines = codecs.iterdecode(upload, "utf-8-sig")
+
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,56 @@
+import os
+import uuid
+
+DOMAIN = os.getenv("DOMAIN")
+
+ALREADY_CONNECTED = {"message": "Você já está conectado com a stripe", "connected": True}
+
+
+def is_connected(establishment):
+    return establishment.stripe_charges_enabled and establishment.stripe_payouts_enabled
+
+
+def account_params(establishment, email):
+    return {
+        "type": "express",
+        "country": "BR",
+        "email": email,
+        "business_profile": {
+            "name": establishment.name,
+        },
+        "capabilities": {
+            "card_payments": {"requested": True},
+            "transfers": {"requested": True},
+        },
+    }
+
+
+def account_link_params(establishment):
+    return {
+        "account": establishment.stripe_account_id,
+        "refresh_url": f"{DOMAIN}/api/stripe/connect/refresh?state={establishment.stripe_onboarding_token}",
+        "return_url": f"{DOMAIN}/api/stripe/connect/return?state={establishment.stripe_onboarding_token}",
+        "type": "account_onboarding",
+    }
+
+
+def attach_account(establishment, account):
+    """Link the new Stripe account and open an onboarding session for it. Saves the establishment."""
+    establishment.stripe_account_id = account["id"]
+    establishment.stripe_onboarding_token = uuid.uuid4()
+    establishment.save(update_fields=["stripe_account_id", "stripe_onboarding_token", "updated_at"])
+
+
+def apply_account(establishment, account):
+    """Copy the account's capabilities to the establishment and close its onboarding. Saves it."""
+    establishment.stripe_charges_enabled = bool(account["charges_enabled"])
+    establishment.stripe_payouts_enabled = bool(account["payouts_enabled"])
+    establishment.stripe_details_submitted = bool(account["details_submitted"])
+    establishment.stripe_onboarding_token = None
+    establishment.save(update_fields=[
+        "stripe_charges_enabled",
+        "stripe_payouts_enabled",
+        "stripe_details_submitted",
+        "stripe_onboarding_token",
+        "updated_at",
+    ])
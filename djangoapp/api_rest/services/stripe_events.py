@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api_rest.models import Appointment, Establishment, StripeEvent, UserPayment
+from api_rest.services.establishments import invalidate as invalidate_establishments
+from api_rest.services.revenue import record_payment
+from api_rest.services.stripe_status import invalidate as invalidate_stripe_status
+from api_rest.services.rollups import update_appointments
+
+
+def handle_checkout_session_completed(session):
+    now = timezone.now()
+
+    # Conditional update: a replayed event matches no unpaid row and writes nothing
+    paid = (UserPayment.objects
+            .filter(stripe_checkout_id=session["id"], has_paid=False)
+            .update(has_paid=True, paid_at=now))
+
+    if paid:
+        update_appointments(
+            Appointment.objects.filter(userpayment__stripe_checkout_id=session["id"]),
+            status=Appointment.Status.CONFIRMED,
+            updated_at=now,
+        )
+
+        flipped = (UserPayment.objects
+                   .filter(stripe_checkout_id=session["id"], paid_at=now)
+                   .values_list("establishment_id", "price"))
+        for establishment_id, price in flipped:
+            record_payment(establishment_id, price, now)
+
+
+def handle_account_updated(account):
+    establishments = Establishment.objects.filter(stripe_account_id=account["id"])
+    affected = list(establishments.values_list("pk", "owner_id"))
+
+    establishments.update(
+        stripe_charges_enabled=bool(account["charges_enabled"]),
+        stripe_payouts_enabled=bool(account["payouts_enabled"]),
+        stripe_details_submitted=bool(account["details_submitted"]),
+        updated_at=timezone.now(),
+    )
+
+    # The queryset update skips the Establishment signals
+    invalidate_establishments(*(owner_id for _, owner_id in affected))
+    invalidate_stripe_status(*(pk for pk, _ in affected))
+
+
+HANDLERS = {
+    "checkout.session.completed": handle_checkout_session_completed,
+    "account.updated": handle_account_updated,
+}
+
+
+def record_event(event_id, event_type, payload):
+    """Store an incoming event once. Returns (StripeEvent, created); created is False for a replay."""
+    return StripeEvent.objects.get_or_create(
+        event_id=event_id,
+        defaults={"type": event_type, "payload": payload},
+    )
+
+
+def process_event(pk):
+    """Apply a pending event. Returns False if it was already handled or another worker holds it."""
+    with transaction.atomic():
+        stripe_event = (StripeEvent.objects
+                        .select_for_update(skip_locked=True)
+                        .filter(pk=pk, status=StripeEvent.Status.PENDING)
+                        .first())
+        if stripe_event is None:
+            return False
+
+        handler = HANDLERS.get(stripe_event.type)
+        if handler:
+            handler(stripe_event.payload["data"]["object"])
+
+        stripe_event.status = StripeEvent.Status.PROCESSED
+        stripe_event.attempts += 1
+        stripe_event.processed_at = timezone.now()
+        stripe_event.save(update_fields=["status", "attempts", "processed_at"])
+
+    return True
+
+
+def record_failure(pk, error):
+    stripe_event = StripeEvent.objects.get(pk=pk)
+    stripe_event.attempts += 1
+    stripe_event.last_error = repr(error)
+
+    if stripe_event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+        stripe_event.status = StripeEvent.Status.FAILED
+
+    stripe_event.save(update_fields=["status", "attempts", "last_error"])
+
+
+def process_pending_events(batch_size=100):
+    """Worker entry point for deferred webhooks. Returns (processed, failed)."""
+    pending = list(StripeEvent.objects
+                   .filter(status=StripeEvent.Status.PENDING)
+                   .order_by("created_at")
+                   .values_list("pk", flat=True)[:batch_size])
+
+    processed = failed = 0
+    for pk in pending:
+        try:
+            if process_event(pk):
+                processed += 1
+        except Exception as error:
+            record_failure(pk, error)
+            failed += 1
+
+    return processed, failed
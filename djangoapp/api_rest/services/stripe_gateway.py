@@ -0,0 +1,245 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+class StripeUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "A Stripe está indisponível no momento, tente novamente em alguns instantes"
+    default_code = "stripe_unavailable"
+
+
+class CircuitOpen(StripeUnavailable):
+    """Refused by the open circuit: the request never reached Stripe."""
+
+
+class CircuitBreaker:
+    """Fail fast after `threshold` consecutive failures instead of waiting on a Stripe that is down.
+
+    Open: every call is refused until `reset_timeout` seconds have passed. Half-open:
+    a single trial call goes through; its success closes the circuit, its failure
+    opens it again. Shared by the threads of a worker, hence the lock.
+    """
+
+    def __init__(self, threshold, reset_timeout, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    @property
+    def retry_after(self):
+        """Seconds until the open circuit lets a trial call through (0 when closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or self._clock() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or (self._opened_at is None and self._failures >= self.threshold):
+                logger.warning("Stripe circuit opened after %s failures", self._failures)
+                self._opened_at = self._clock()
+            self._trial = False
+
+
+_lock = threading.Lock()
+_client = None
+_breaker = None
+_executor = None
+
+
+def _build_client():
+    # The *_async methods go through httpx's AsyncClient when it is installed
+    async_client = None
+    if httpx is not None:
+        timeout = httpx.Timeout(settings.STRIPE_READ_TIMEOUT, connect=settings.STRIPE_CONNECT_TIMEOUT)
+        async_client = stripe.HTTPXClient(timeout=timeout)
+
+    # One requests session per thread, kept alive between calls, so the TLS handshake
+    # is paid once per worker thread instead of once per request
+    http_client = stripe.RequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        async_fallback_client=async_client,
+    )
+    base_addresses = {"api": settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else None
+
+    # Retries use Stripe's jittered exponential backoff; every POST carries an
+    # Idempotency-Key, so a retried create never charges or creates twice
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY or "",
+        base_addresses=base_addresses,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        http_client=http_client,
+    )
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def get_breaker():
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(settings.STRIPE_CIRCUIT_THRESHOLD, settings.STRIPE_CIRCUIT_RESET_SECONDS)
+    return _breaker
+
+
+def get_executor():
+    # Threads that run the blocking calls of async views when httpx is missing
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(settings.STRIPE_ASYNC_FALLBACK_THREADS, thread_name_prefix="stripe")
+    return _executor
+
+
+def reset():
+    """Drop the client and the breaker so the next call rebuilds them from settings."""
+    global _client, _breaker
+    with _lock:
+        _client = None
+        _breaker = None
+
+
+def _is_outage(error):
+    # Network errors and 5xx mean Stripe is unreachable; 4xx are answers about our request
+    if isinstance(error, stripe.APIConnectionError):
+        return True
+    return isinstance(error, stripe.StripeError) and (error.http_status or 0) >= 500
+
+
+def _raise_for(breaker, error):
+    if not _is_outage(error):
+        breaker.record_success()
+        raise error
+    breaker.record_failure()
+    logger.warning("Stripe request failed: %s", error)
+    raise StripeUnavailable() from error
+
+
+def _call(service, method, *args):
+    breaker = get_breaker()
+    if not breaker.allow():
+        raise CircuitOpen()
+
+    try:
+        result = getattr(service, method)(*args)
+    except stripe.StripeError as error:
+        _raise_for(breaker, error)
+    except BaseException:
+        # Anything else (a bug, a cancelled await) must still settle a half-open trial,
+        # or allow() would refuse every call until the process restarts
+        breaker.record_failure()
+        raise
+
+    breaker.record_success()
+    return result
+
+
+async def _acall(service, method, *args):
+    """_call through the *_async twin of `method`, awaited on the running event loop.
+
+    Without httpx there is no async transport, so the blocking call runs in a
+    thread of get_executor() instead of pinning the event loop.
+    """
+    if httpx is None:
+        return await sync_to_async(_call, thread_sensitive=False, executor=get_executor())(service, method, *args)
+
+    breaker = get_breaker()
+    if not breaker.allow():
+        raise CircuitOpen()
+
+    try:
+        result = await getattr(service, f"{method}_async")(*args)
+    except stripe.StripeError as error:
+        _raise_for(breaker, error)
+    except BaseException:
+        # Anything else (a bug, a cancelled await) must still settle a half-open trial,
+        # or allow() would refuse every call until the process restarts
+        breaker.record_failure()
+        raise
+
+    breaker.record_success()
+    return result
+
+
+def _options(idempotency_key):
+    return {"idempotency_key": str(idempotency_key)} if idempotency_key else None
+
+
+def create_checkout_session(params, idempotency_key=None):
+    return _call(get_client().v1.checkout.sessions, "create", params, _options(idempotency_key))
+
+
+def create_account(params, idempotency_key=None):
+    return _call(get_client().v1.accounts, "create", params, _options(idempotency_key))
+
+
+def create_account_link(params, idempotency_key=None):
+    return _call(get_client().v1.account_links, "create", params, _options(idempotency_key))
+
+
+def retrieve_account(account_id):
+    return _call(get_client().v1.accounts, "retrieve", account_id)
+
+
+async def acreate_checkout_session(params, idempotency_key=None):
+    return await _acall(get_client().v1.checkout.sessions, "create", params, _options(idempotency_key))
+
+
+async def acreate_account(params, idempotency_key=None):
+    return await _acall(get_client().v1.accounts, "create", params, _options(idempotency_key))
+
+
+async def acreate_account_link(params, idempotency_key=None):
+    return await _acall(get_client().v1.account_links, "create", params, _options(idempotency_key))
+
+
+async def aretrieve_account(account_id):
+    return await _acall(get_client().v1.accounts, "retrieve", account_id)
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from api_rest.conditional import make_etag
+
+CACHE_TIMEOUT = 60 * 60
+
+DISCONNECTED = "disconnected"
+PENDING = "pending"
+CONNECTED = "connected"
+
+BODIES = {
+    DISCONNECTED: {
+        "status": "Desconetcado",
+        "connected": False,
+        "observation": "Você não está conectado a stripe, para se conectar clique no botão abaixo e preencha os dados",
+    },
+    PENDING: {
+        "status": "Pendente",
+        "connected": False,
+        "observation": "Sua integração está pendente de confirmação, esse periodo pode levar de 24 a 48 horas",
+    },
+    CONNECTED: {
+        "status": "Conectado",
+        "connected": True,
+        "observation": "Sua conta está integrada a Strie",
+    },
+}
+
+
+def cache_key(establishment_id):
+    return f"stripe_status:{establishment_id}"
+
+
+def derive(establishment):
+    if not establishment.stripe_details_submitted:
+        return DISCONNECTED
+    if not (establishment.stripe_charges_enabled and establishment.stripe_payouts_enabled):
+        return PENDING
+    return CONNECTED
+
+
+def integration_status(establishment):
+    """{"code", "body", "etag", "updated_at"} of the Stripe integration of `establishment`.
+
+    Cached per establishment; Establishment saves and the account.updated webhook drop it.
+    """
+    key = cache_key(establishment.pk)
+    status = cache.get(key)
+    if status is None:
+        code = derive(establishment)
+        status = {
+            "code": code,
+            "body": BODIES[code],
+            "etag": make_etag(establishment.pk, code),
+            "updated_at": establishment.updated_at,
+        }
+        cache.set(key, status, CACHE_TIMEOUT)
+    return status
+
+
+def invalidate(*establishment_ids):
+    keys = [cache_key(establishment_id) for establishment_id in establishment_ids if establishment_id]
+    if not keys:
+        return
+
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
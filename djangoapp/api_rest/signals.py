@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Appointment, Establishment
+from .services import establishments, rollups, slots, stripe_status
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = None
+    if instance.pk:
+        previous = Appointment.objects.filter(pk=instance.pk).values_list(*rollups.BUCKET_FIELDS, "end_at").first()
+
+    instance._rollup_bucket = rollups.make_bucket(*previous[:-1]) if previous else None
+    instance._previous_slot = (previous[0], previous[1], previous[-1]) if previous else None
+
+
+@receiver(post_save, sender=Appointment)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.move(getattr(instance, "_rollup_bucket", None), rollups.bucket_of(instance))
+
+
+@receiver(post_save, sender=Appointment)
+def invalidate_slots_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if getattr(instance, "_previous_slot", None):
+        slots.invalidate(*instance._previous_slot)
+    slots.invalidate(instance.location_id, instance.start_at, instance.end_at)
+
+
+@receiver(post_delete, sender=Appointment)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    rollups.move(rollups.bucket_of(instance), None)
+    slots.invalidate(instance.location_id, instance.start_at, instance.end_at)
+
+
+@receiver(post_save, sender=Establishment)
+@receiver(post_delete, sender=Establishment)
+def invalidate_user_establishments(sender, instance, **kwargs):
+    establishments.invalidate(instance.owner_id)
+    stripe_status.invalidate(instance.pk)
@@ -2,6 +2,13 @@
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.utils import timezone
+from datetime import datetime
+from api_rest.models import Customer, Appointment, Establishment
+from api_rest.services import stripe_gateway
+from django.test import override_settings
+from unittest import mock
+from api_rest.services.fake_stripe import FakeStripeServer
 
 User = get_user_model()
 
@@ -24,4 +31,73 @@ class AuthenticatedTestMixin:
 
     def unauthenticate_client(self):
         self.client.credentials()
-    
\ No newline at end of file
+
+class EstablishmentFixturesMixin(AuthenticatedTestMixin):
+    def setUp(self):
+        super().setUp()
+
+        self.establishment = Establishment.objects.create(
+            name="Unidade Teste",
+            cnpj="00000000000100",
+            city="São Paulo",
+            state="SP",
+            adress="Rua Teste",
+            number="10",
+            phone="+55 11 99999999",
+            owner=self.user,
+        )
+        self.customer = self.create_customer()
+
+    def create_customer(self, **kwargs):
+        data = dict(
+            full_name="Carlos Usuario Teste",
+            phone="+55 11 88888888",
+            email="carlos@email.com",
+            created_by=self.user,
+        )
+        data.update(kwargs)
+        return Customer.objects.create(**data)
+
+    def create_appointment(self, start_at=None, **kwargs):
+        data = dict(
+            customer=self.customer,
+            location=self.establishment,
+            start_at=start_at or timezone.make_aware(datetime(2026, 1, 10, 9, 0, 0)),
+            status="SCHEDULED",
+            price=60.00,
+            payment_method="PIX",
+            created_by=self.user,
+        )
+        data.update(kwargs)
+        return Appointment.objects.create(**data)
+
+
+class FakeStripeMixin:
+    """Points the Stripe gateway at a local FakeStripeServer (self.stripe) for the test."""
+
+    stripe_settings = {}
+
+    def setUp(self):
+        super().setUp()
+        self.stripe = FakeStripeServer().start()
+        self.addCleanup(self.stripe.stop)
+
+        overrides = override_settings(**{
+            "STRIPE_SECRET_KEY": "sk_test_fake",
+            "STRIPE_API_BASE": self.stripe.url,
+            "STRIPE_READ_TIMEOUT": 0.3,
+            "STRIPE_MAX_NETWORK_RETRIES": 2,
+            "STRIPE_CIRCUIT_THRESHOLD": 2,
+            "STRIPE_CIRCUIT_RESET_SECONDS": 60,
+            **self.stripe_settings,
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        stripe_gateway.reset()
+        self.addCleanup(stripe_gateway.reset)
+
+        # No backoff sleeps in tests; the retry decisions are still Stripe's
+        sleep = mock.patch("stripe._http_client.HTTPClient._sleep_time_seconds", return_value=0)
+        sleep.start()
+        self.addCleanup(sleep.stop)
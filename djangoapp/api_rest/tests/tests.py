@@ -1,14 +1,55 @@
 from django.test import TestCase
-from ..models import Customer, Appointment
+from ..models import Customer, Appointment, Establishment, OutboundEmail, UserPayment, StripeEvent, EstablishmentRevenue, AppointmentDailySummary
+from .. import async_views
+from ..views import StripeCheckStatusIntegration
+from ..webhooks import astripe_webhook
+from asgiref.sync import sync_to_async
+from ..pagination import CreatedAtCursorPagination
+from ..renderers import FastJSONParser, FastJSONRenderer
+from ..readers import AppointmentReader, CustomerReader
+from ..serializers import AppointmentSerializer, CustomerSerializer
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, time, timedelta
+import asyncio
+import csv
+import json
+import random
+import uuid
 from rest_framework.test import APITestCase
 from rest_framework import status
-from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from django.utils.translation import gettext_lazy
+from django.urls import resolve, reverse
+from django.apps import apps as django_apps
+from django.db.models import F
+from importlib import import_module
+from django.utils.http import http_date
 from django.contrib.auth import get_user_model
-from .mixins import AuthenticatedTestMixin
+from rest_framework_simplejwt.tokens import RefreshToken
+from .mixins import AuthenticatedTestMixin, EstablishmentFixturesMixin, FakeStripeMixin
 from api_rest.services.send_email import send_email
 from django.core import mail
+from django.core.mail import get_connection
+from django.core.management import call_command
+from api_rest.services.email_outbox import queue_email, deliver_batch
+from api_rest.services.revenue import find_drift
+from decimal import Decimal
+from smtplib import SMTPException
+from time import monotonic
+from unittest import mock
+from io import BytesIO, StringIO
+import os
+import runpy
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import CaptureQueriesContext
+import stripe
+from api_rest.services import checkout_sessions, stripe_gateway
+from django.test import override_settings
+from django.conf import settings
 
 User = get_user_model()
 
@@ -335,4 +376,1576 @@ class SendEmailTest(TestCase):
         response = send_email()
         self.assertEqual(len(mail.outbox), 1)
     
-        
\ No newline at end of file
+        
+class TestListPagination(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        for hour in range(5):
+            self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 10, 8 + hour, 0, 0)))
+
+    def test_appointments_are_returned_in_cursor_pages(self):
+        self.authenticate_client()
+
+        response = self.client.get("/api/appointment/?page_size=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+
+        seen = [row["id"] for row in response.data["results"]]
+        next_url = response.data["next"]
+        while next_url:
+            response = self.client.get(next_url)
+            seen += [row["id"] for row in response.data["results"]]
+            next_url = response.data["next"]
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_page_size_is_capped(self):
+        max_page_size = CreatedAtCursorPagination.max_page_size
+        Customer.objects.bulk_create([
+            Customer(
+                full_name=f"Cliente {i}",
+                phone=f"+55 11 7000{i:04d}",
+                email=f"cliente{i}@email.com",
+                created_by=self.user,
+            )
+            for i in range(max_page_size + 5)
+        ])
+
+        self.authenticate_client()
+        response = self.client.get("/api/customer/?page_size=100000")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), max_page_size)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_appointment_list_query_count_does_not_grow_with_rows(self):
+        self.authenticate_client()
+        url = "/api/appointment/?page_size=200"
+
+        with CaptureQueriesContext(connection) as few_rows:
+            self.client.get(url)
+
+        Appointment.objects.bulk_create([
+            Appointment(
+                customer=Customer.objects.create(
+                    full_name=f"Cliente {i}",
+                    phone=f"+55 11 7000{i:04d}",
+                    email=f"cliente{i}@email.com",
+                    created_by=self.user,
+                ),
+                location=self.establishment,
+                start_at=timezone.make_aware(datetime(2026, 2, 1, 8, 0, 0)),
+                status="SCHEDULED",
+                price=60.00,
+                payment_method="PIX",
+                created_by=self.user,
+            )
+            for i in range(30)
+        ])
+
+        with self.assertNumQueries(len(few_rows)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 35)
+
+        customer_url = f"/api/filter-appointment-customer/{self.customer.id}/"
+        with self.assertNumQueries(len(few_rows)):
+            response = self.client.get(customer_url)
+        self.assertEqual(len(response.data), 5)
+
+        detail_url = f"/api/appointment/{response.data[0]['id']}/"
+        with self.assertNumQueries(len(few_rows)):
+            self.client.get(detail_url)
+
+class TestSearch(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_customer = self.create_customer(
+            full_name="Maria Cliente",
+            phone="+55 21 77777777",
+            email="maria@email.com",
+        )
+        self.morning = self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 10, 9, 0, 0)))
+        self.next_day = self.create_appointment(
+            start_at=timezone.make_aware(datetime(2026, 1, 11, 9, 0, 0)),
+            customer=self.other_customer,
+            status="CONFIRMED",
+        )
+
+    def search_appointments(self, q):
+        self.authenticate_client()
+        response = self.client.get("/api/appointment/", {"q": q})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row["id"] for row in response.data["results"]}
+
+    def test_date_search_is_a_day_range(self):
+        self.assertEqual(self.search_appointments("2026-01-10"), {self.morning.id})
+        self.assertEqual(self.search_appointments("11/01/2026"), {self.next_day.id})
+        self.assertEqual(self.search_appointments("2026-01"), {self.morning.id, self.next_day.id})
+
+    def test_search_by_phone_and_status(self):
+        self.assertEqual(self.search_appointments("21 7777"), {self.next_day.id})
+        self.assertEqual(self.search_appointments("confirm"), {self.next_day.id})
+
+    def test_customer_search(self):
+        self.authenticate_client()
+        response = self.client.get("/api/customer/", {"q": "MARIA"})
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.other_customer.id])
+
+class TestEmailOutbox(AuthenticatedTestMixin, APITestCase):
+    def test_password_reset_only_queues_the_email(self):
+        response = self.client.post(
+            "/api/auth/password-reset/",
+            data={"email": self.user.email},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(status="PENDING").count(), 1)
+
+        call_command("send_queued_emails", stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertEqual(OutboundEmail.objects.get().status, "SENT")
+
+    def test_batch_is_sent_over_a_single_connection(self):
+        for i in range(3):
+            queue_email("Assunto", "<p>corpo</p>", [f"cliente{i}@email.com"], "from@email.com")
+
+        with mock.patch("api_rest.services.email_outbox.get_connection", wraps=get_connection) as connection_factory:
+            sent, failed = deliver_batch()
+
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(connection_factory.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        outbound = queue_email("Assunto", "<p>corpo</p>", ["cliente@email.com"], "from@email.com")
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=SMTPException("servidor indisponível"),
+        ):
+            self.assertEqual(deliver_batch(), (0, 1))
+
+            outbound.refresh_from_db()
+            self.assertEqual(outbound.status, "PENDING")
+            self.assertEqual(outbound.attempts, 1)
+            self.assertGreater(outbound.next_attempt_at, timezone.now())
+
+            # Not due yet, so the worker leaves it alone
+            self.assertEqual(deliver_batch(), (0, 0))
+
+            with self.settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2):
+                OutboundEmail.objects.update(next_attempt_at=timezone.now())
+                deliver_batch()
+
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, "FAILED")
+        self.assertEqual(len(mail.outbox), 0)
+
+def construct_event_stub(payload, sig_header, secret):
+    return json.loads(payload)
+
+
+@mock.patch("stripe.Webhook.construct_event", side_effect=construct_event_stub)
+class TestStripeWebhookReplay(EstablishmentFixturesMixin, APITestCase):
+    url = "/stripe/webhook/"
+
+    def setUp(self):
+        super().setUp()
+        self.establishment.stripe_account_id = "acct_test"
+        self.establishment.save()
+
+        self.payments = []
+        for i in range(40):
+            appointment = self.create_appointment(
+                start_at=timezone.make_aware(datetime(2026, 1, 10, 8, 0, 0)) + timedelta(hours=i),
+            )
+            self.payments.append(UserPayment.objects.create(
+                customer=self.customer,
+                appointment=appointment,
+                establishment=self.establishment,
+                stripe_checkout_id=f"cs_test_{i}",
+                price=appointment.price,
+                amount_cents=6000,
+                currency="brl",
+            ))
+
+    def checkout_event(self, payment):
+        return {
+            "id": f"evt_checkout_{payment.id}",
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": payment.stripe_checkout_id}},
+        }
+
+    def account_event(self, n):
+        return {
+            "id": f"evt_account_{n}",
+            "type": "account.updated",
+            "data": {"object": {
+                "id": "acct_test",
+                "charges_enabled": True,
+                "payouts_enabled": True,
+                "details_submitted": True,
+            }},
+        }
+
+    def event_stream(self):
+        rng = random.Random(7)
+        events = [self.checkout_event(payment) for payment in self.payments]
+        events += [self.account_event(n) for n in range(5)]
+        # Every event is delivered between one and four times, in random order
+        stream = [event for event in events for _ in range(rng.randint(1, 4))]
+        rng.shuffle(stream)
+        return events, stream
+
+    def deliver(self, event):
+        return self.client.generic(
+            "POST", self.url, json.dumps(event),
+            content_type="application/json", HTTP_STRIPE_SIGNATURE="t=0,v1=stub",
+        )
+
+    def test_replayed_stream_applies_each_event_once(self, construct_event):
+        events, stream = self.event_stream()
+
+        for event in stream:
+            self.assertEqual(self.deliver(event).status_code, status.HTTP_200_OK)
+
+        self.assertEqual(StripeEvent.objects.count(), len(events))
+        self.assertFalse(StripeEvent.objects.exclude(status="PROCESSED").exists())
+        self.assertFalse(UserPayment.objects.filter(has_paid=False).exists())
+        self.assertFalse(Appointment.objects.exclude(status="CONFIRMED").exists())
+
+        self.establishment.refresh_from_db()
+        self.assertTrue(self.establishment.stripe_charges_enabled)
+
+    def test_duplicate_delivery_does_not_write(self, construct_event):
+        event = self.checkout_event(self.payments[0])
+        self.deliver(event)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.deliver(event)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries if q["sql"].startswith("UPDATE")])
+
+    def test_deferred_events_are_applied_by_the_worker(self, construct_event):
+        events, stream = self.event_stream()
+
+        with self.settings(STRIPE_WEBHOOK_DEFER=True):
+            for event in stream:
+                self.deliver(event)
+
+        self.assertEqual(StripeEvent.objects.filter(status="PENDING").count(), len(events))
+        self.assertFalse(UserPayment.objects.filter(has_paid=True).exists())
+
+        call_command("process_stripe_events", stdout=StringIO())
+
+        self.assertFalse(StripeEvent.objects.exclude(status="PROCESSED").exists())
+        self.assertFalse(UserPayment.objects.filter(has_paid=False).exists())
+
+    def test_paid_checkouts_update_the_revenue_totals(self, construct_event):
+        events, stream = self.event_stream()
+        for event in stream:
+            self.deliver(event)
+
+        revenue = EstablishmentRevenue.objects.get(establishment=self.establishment)
+        self.assertEqual(revenue.paid_count, len(self.payments))
+        self.assertEqual(revenue.paid_total, Decimal("60.00") * len(self.payments))
+
+        self.authenticate_client()
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/stripe/payments_value")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], revenue.paid_total)
+
+        out = StringIO()
+        call_command("reconcile_revenue", stdout=out)
+        self.assertIn("match", out.getvalue())
+
+    def test_reconcile_reports_and_fixes_drift(self, construct_event):
+        for payment in self.payments[:3]:
+            self.deliver(self.checkout_event(payment))
+        EstablishmentRevenue.objects.update(paid_total=Decimal("1.00"))
+
+        out = StringIO()
+        call_command("reconcile_revenue", "--dry-run", stdout=out)
+        self.assertIn("drifted", out.getvalue())
+        self.assertEqual(EstablishmentRevenue.objects.get().paid_total, Decimal("1.00"))
+
+        call_command("reconcile_revenue", stdout=StringIO())
+        self.assertEqual(EstablishmentRevenue.objects.get().paid_total, Decimal("180.00"))
+        self.assertEqual(find_drift(), [])
+
+class TestDashboardSummary(EstablishmentFixturesMixin, APITestCase):
+    url = "/api/dashboard/daily-summary/"
+
+    def setUp(self):
+        super().setUp()
+        day = datetime(2026, 1, 10, 9, 0, 0)  # Saturday
+        self.pix = self.create_appointment(start_at=timezone.make_aware(day), number_people=2)
+        self.card = self.create_appointment(
+            start_at=timezone.make_aware(day + timedelta(hours=2)),
+            payment_method="CARD",
+            price=40.00,
+        )
+        self.canceled = self.create_appointment(start_at=timezone.make_aware(day + timedelta(hours=4)))
+        self.monday = self.create_appointment(start_at=timezone.make_aware(day + timedelta(days=2)))
+
+    def get_summary(self, **params):
+        self.authenticate_client()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries if "api_rest_appointment\"" in q["sql"]])
+        return response.data
+
+    def test_day_summary_follows_appointment_writes(self):
+        self.authenticate_client()
+        self.client.delete(f"/api/appointment/{self.canceled.id}/")
+        self.card.status = "CONFIRMED"
+        self.card.save()
+
+        summary = self.get_summary(date="2026-01-10")
+
+        self.assertEqual(summary["appointments"]["total"], 3)
+        self.assertEqual(summary["appointments"]["by_status"], {"SCHEDULED": 1, "CONFIRMED": 1, "CANCELED": 1})
+        self.assertEqual(summary["revenue"], "100.00")
+        self.assertEqual(summary["number_people"], 3)
+        self.assertEqual(summary["payment_methods"]["PIX"], {"appointments": 1, "revenue": "60.00"})
+        self.assertEqual(summary["payment_methods"]["CARD"], {"appointments": 1, "revenue": "40.00"})
+
+    def test_week_and_month_periods(self):
+        week = self.get_summary(date="2026-01-10", period="week")
+        self.assertEqual((week["start"], week["end"]), ("2026-01-05", "2026-01-11"))
+        self.assertEqual(week["appointments"]["total"], 3)
+
+        month = self.get_summary(date="2026-01-10", period="month")
+        self.assertEqual((month["start"], month["end"]), ("2026-01-01", "2026-01-31"))
+        self.assertEqual(month["appointments"]["total"], 4)
+        self.assertEqual([day["date"] for day in month["days"]], ["2026-01-10", "2026-01-12"])
+
+    def test_moving_an_appointment_moves_its_bucket(self):
+        self.monday.start_at = timezone.make_aware(datetime(2026, 2, 1, 9, 0, 0))
+        self.monday.end_at = timezone.make_aware(datetime(2026, 2, 1, 10, 0, 0))
+        self.monday.save()
+        self.pix.delete()
+
+        self.assertEqual(self.get_summary(date="2026-01-10", period="month")["appointments"]["total"], 2)
+        self.assertEqual(self.get_summary(date="2026-02-01")["appointments"]["total"], 1)
+
+        stored = set(AppointmentDailySummary.objects.values_list("day", "status", "appointment_count", "price_total"))
+        call_command("rebuild_dashboard_rollups", stdout=StringIO())
+        rebuilt = set(AppointmentDailySummary.objects.values_list("day", "status", "appointment_count", "price_total"))
+        self.assertEqual(stored - {row for row in stored if row[2] == 0}, rebuilt)
+
+    def test_deleting_an_establishment_drops_its_rollup(self):
+        self.establishment.delete()
+
+        connection.check_constraints()
+        self.assertFalse(AppointmentDailySummary.objects.exists())
+
+    def test_deleting_a_user_drops_its_rollup(self):
+        self.user.delete()
+
+        connection.check_constraints()
+        self.assertFalse(AppointmentDailySummary.objects.exists())
+
+class TestEndAtBackfill(EstablishmentFixturesMixin, APITestCase):
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 1, 10, hour, minute))
+
+    def legacy(self, start_at):
+        # A booking without a duration, written before end_at was validated
+        return Appointment.objects.bulk_create([Appointment(
+            customer=self.customer, location=self.establishment, start_at=start_at, end_at=start_at,
+            status="SCHEDULED", price=60, payment_method="PIX", created_by=self.user,
+        )])[0]
+
+    def backfill(self, *appointments):
+        # Recreate what 0014 found: bookings without a duration
+        Appointment.objects.filter(pk__in=[a.pk for a in appointments]).update(end_at=F("start_at"))
+        import_module("api_rest.migrations.0014_appointment_end_at").backfill_end_at(django_apps, None)
+        return [Appointment.objects.get(pk=a.pk).end_at for a in appointments]
+
+    def test_durations_are_clipped_to_the_next_booking(self):
+        first = self.legacy(self.at(9))
+        second = self.legacy(self.at(9, 30))
+        third = self.legacy(self.at(12))
+        canceled = self.create_appointment(start_at=self.at(9, 15), status="CANCELED")
+        later = self.create_appointment(start_at=self.at(12, 30), end_at=self.at(15))
+
+        ends = self.backfill(first, second, third, canceled)
+
+        self.assertEqual(ends, [self.at(9, 30), self.at(10, 30), self.at(12, 30), self.at(10, 15)])
+        self.assertEqual(Appointment.objects.get(pk=later.pk).end_at, self.at(15))
+
+    def test_covered_booking_stays_empty(self):
+        long = self.create_appointment(start_at=self.at(13), end_at=self.at(15))
+        inside = self.legacy(self.at(14))
+
+        self.assertEqual(self.backfill(inside), [self.at(14)])
+        self.assertEqual(Appointment.objects.get(pk=long.pk).end_at, self.at(15))
+
+class TestAppointmentOverlap(EstablishmentFixturesMixin, APITestCase):
+    url = "/api/appointment/"
+
+    def setUp(self):
+        super().setUp()
+        self.existing = self.create_appointment(
+            start_at=timezone.make_aware(datetime(2026, 1, 10, 9, 0, 0)),
+            end_at=timezone.make_aware(datetime(2026, 1, 10, 10, 0, 0)),
+        )
+
+    def book(self, start, end=None):
+        payload = dict(
+            customer_id=self.customer.id,
+            start_at=timezone.make_aware(start).isoformat(),
+            price="95.00",
+            payment_method="PIX",
+        )
+        if end:
+            payload["end_at"] = timezone.make_aware(end).isoformat()
+
+        self.authenticate_client()
+        return self.client.post(self.url, data=payload, format="json")
+
+    def test_overlapping_booking_is_rejected(self):
+        response = self.book(datetime(2026, 1, 10, 9, 30), datetime(2026, 1, 10, 10, 30))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("start_at", response.data)
+
+        # A booking that wraps the existing one entirely
+        response = self.book(datetime(2026, 1, 10, 8, 0), datetime(2026, 1, 10, 11, 0))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_booking_can_start_when_the_previous_one_ends(self):
+        response = self.book(datetime(2026, 1, 10, 10, 0), datetime(2026, 1, 10, 11, 0))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.book(datetime(2026, 1, 10, 8, 0), datetime(2026, 1, 10, 9, 0))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_default_duration_and_canceled_slots(self):
+        response = self.book(datetime(2026, 1, 10, 9, 0))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.delete(f"{self.url}{self.existing.id}/")
+        response = self.book(datetime(2026, 1, 10, 9, 0))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        appointment = Appointment.objects.get(pk=response.data["id"])
+        self.assertEqual(appointment.end_at - appointment.start_at, timedelta(minutes=60))
+
+    def test_rescheduling_keeps_duration_and_ignores_itself(self):
+        self.authenticate_client()
+        new_start = timezone.make_aware(datetime(2026, 1, 10, 9, 30))
+        response = self.client.patch(
+            f"{self.url}{self.existing.id}/",
+            data={"start_at": new_start.isoformat()},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.end_at, new_start + timedelta(hours=1))
+
+    def test_end_before_start_is_rejected(self):
+        response = self.book(datetime(2026, 1, 10, 12, 0), datetime(2026, 1, 10, 11, 0))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("end_at", response.data)
+
+    def test_empty_range_is_rejected(self):
+        # An empty range would block nothing: another booking could take the same time
+        response = self.book(datetime(2026, 1, 10, 12, 0), datetime(2026, 1, 10, 12, 0))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("end_at", response.data)
+
+        with self.assertRaises(ValidationError):
+            self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 10, 12, 0)),
+                                    end_at=timezone.make_aware(datetime(2026, 1, 10, 12, 0)))
+
+class TestAvailableSlots(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.establishment.opens_at = time(8, 0)
+        self.establishment.closes_at = time(12, 0)
+        self.establishment.save()
+
+        self.day = timezone.localdate() + timedelta(days=30)
+        self.url = f"/api/establishment/{self.establishment.id}/slots/"
+        self.create_appointment(start_at=self.at(9), end_at=self.at(10))
+
+    def at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.day, time(hour, minute)))
+
+    def get_slots(self, **params):
+        self.authenticate_client()
+        response = self.client.get(self.url, {"start": self.day.isoformat(), **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            [datetime.fromisoformat(slot["start_at"]).hour for slot in day["slots"]]
+            for day in response.data["days"]
+        ]
+
+    def test_slots_skip_booked_time(self):
+        self.assertEqual(self.get_slots(), [[8, 10, 11]])
+        self.assertEqual(self.get_slots(duration=120), [[10]])
+
+    def test_multi_day_range_and_cache(self):
+        end = self.day + timedelta(days=2)
+        self.assertEqual(self.get_slots(end=end.isoformat()), [[8, 10, 11], [8, 9, 10, 11], [8, 9, 10, 11]])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_slots(end=end.isoformat())
+        self.assertFalse([q for q in queries if "api_rest_appointment\"" in q["sql"]])
+
+    def test_booking_and_cancelling_invalidate_the_day(self):
+        self.assertEqual(self.get_slots(), [[8, 10, 11]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = self.create_appointment(start_at=self.at(10, 30), end_at=self.at(11, 30))
+        self.assertEqual(self.get_slots(), [[8]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/appointment/{appointment.id}/")
+        self.assertEqual(self.get_slots(), [[8, 10, 11]])
+
+    def test_local_memory_cache_keeps_slots_briefly(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("CACHE_BACKEND", None)
+            self.assertEqual(runpy.run_module("project.settings")["SLOTS_CACHE_TIMEOUT"], 120)
+            os.environ["CACHE_BACKEND"] = "django.core.cache.backends.redis.RedisCache"
+            self.assertEqual(runpy.run_module("project.settings")["SLOTS_CACHE_TIMEOUT"], 60 * 60 * 24)
+
+        with mock.patch("api_rest.services.slots.cache.set_many") as set_many:
+            self.get_slots()
+        self.assertEqual(set_many.call_args.args[1], settings.SLOTS_CACHE_TIMEOUT)
+
+    def test_invalid_range(self):
+        self.authenticate_client()
+        response = self.client.get(self.url, {"start": self.day.isoformat(), "end": "2000-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TestBulkAppointments(EstablishmentFixturesMixin, APITestCase):
+    url = "/api/appointment/bulk/"
+
+    def setUp(self):
+        super().setUp()
+        self.existing = self.create_appointment(
+            start_at=self.at(9), end_at=self.at(10), price=Decimal("60.00"),
+        )
+        self.authenticate_client()
+
+    def at(self, hour, day=10):
+        return timezone.make_aware(datetime(2026, 1, day, hour, 0))
+
+    def item(self, hour, day=10, **kwargs):
+        return {
+            "customer_id": self.customer.id,
+            "start_at": self.at(hour, day).isoformat(),
+            "end_at": self.at(hour + 1, day).isoformat(),
+            "price": "50.00",
+            "payment_method": "PIX",
+            **kwargs,
+        }
+
+    def test_create_update_and_cancel_in_one_request(self):
+        other = self.create_appointment(start_at=self.at(14), end_at=self.at(15))
+        payload = {
+            "create": [self.item(hour) for hour in (10, 11, 12)],
+            "update": [{"id": self.existing.id, "start_at": self.at(8).isoformat()}],
+            "cancel": [other.id],
+        }
+
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(len(response.data["created"]), 3)
+        created = Appointment.objects.filter(id__in=response.data["created"])
+        self.assertTrue(all(a.location_id == self.establishment.id and a.created_by_id == self.user.id for a in created))
+
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.start_at, self.existing.end_at), (self.at(8), self.at(9)))
+        other.refresh_from_db()
+        self.assertEqual(other.status, Appointment.Status.CANCELED)
+
+        # Bulk writes skip signals, the rollup must still match a rebuild
+        stored = set(AppointmentDailySummary.objects.values_list("day", "status", "appointment_count", "price_total"))
+        call_command("rebuild_dashboard_rollups", stdout=StringIO())
+        rebuilt = set(AppointmentDailySummary.objects.values_list("day", "status", "appointment_count", "price_total"))
+        self.assertEqual(stored, rebuilt)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def post(hours, day):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, {"create": [self.item(hour, day) for hour in hours]}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            return len(queries)
+
+        # Rollup rows are per day/status/method, so every item lands in the same one
+        small = post([8], day=20)
+        large = post(range(8, 18), day=21)
+        self.assertLessEqual(large, small + 2)
+
+    def test_errors_are_reported_per_item_and_nothing_is_written(self):
+        foreign = get_user_model().objects.create_user(username="other", password="12345678")
+        foreign_customer = Customer.objects.create(full_name="Alheio", phone="1", email="a@a.com", created_by=foreign)
+        count = Appointment.objects.count()
+
+        response = self.client.post(self.url, {
+            "create": [
+                self.item(11),
+                self.item(9),
+                self.item(11),
+                self.item(13, customer_id=foreign_customer.id),
+            ],
+            "cancel": [999999],
+        }, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        create_errors = response.data["create"]
+        self.assertEqual(create_errors[0], {})
+        self.assertIn("start_at", create_errors[1])
+        self.assertIn("start_at", create_errors[2])
+        self.assertIn("customer_id", create_errors[3])
+        self.assertIn("id", response.data["cancel"][0])
+        self.assertEqual(Appointment.objects.count(), count)
+
+    def test_empty_range_is_rejected(self):
+        response = self.client.post(self.url, {"create": [self.item(14, end_at=self.at(14).isoformat())]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("end_at", response.data["create"][0])
+
+        # Only end_at sent: the check runs against the stored start_at
+        response = self.client.post(self.url, {"update": [{"id": self.existing.id, "end_at": self.at(9).isoformat()}]},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("end_at", response.data["update"][0])
+
+    def test_rescheduling_into_a_slot_freed_by_the_same_batch(self):
+        payload = {
+            "create": [self.item(9)],
+            "update": [{"id": self.existing.id, "start_at": self.at(10).isoformat()}],
+        }
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+    def test_serializer_errors_are_per_item(self):
+        response = self.client.post(self.url, {"create": [self.item(11), self.item(12, payment_method="BOLETO")]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["create"][0], {})
+        self.assertIn("payment_method", response.data["create"][1])
+
+    def test_empty_batch(self):
+        response = self.client.post(self.url, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TestCustomerImportExport(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client()
+
+    def upload(self, name, content, **data):
+        return self.client.post(
+            "/api/customer/import/",
+            {"file": SimpleUploadedFile(name, content.encode()), **data},
+            format="multipart",
+        )
+
+    def test_csv_import_in_chunks_skips_duplicates(self):
+        content = "\ufefffull_name,phone,email\n" + "".join(
+            f"Cliente {n},+55 11 7000{n:04d},cliente{n}@email.com\n" for n in range(25)
+        )
+        # Same email as the fixture customer, same phone as row 0, and a broken row
+        content += "Repetido,+55 11 1,CARLOS@email.com\nRepetido 2,+55 11 70000000,outro@email.com\nSem email,+55 11 2,\n"
+
+        with mock.patch("api_rest.services.customer_import.CHUNK_SIZE", 10):
+            response = self.upload("clientes.csv", content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 25)
+        self.assertEqual(response.data["duplicates"], 2)
+        self.assertEqual(response.data["invalid"], 1)
+        self.assertEqual(response.data["errors"][0]["line"], 29)
+        self.assertEqual(Customer.objects.filter(created_by=self.user).count(), 26)
+
+        # Uploading the same file again creates nothing
+        self.assertEqual(self.upload("clientes.csv", content).data["created"], 0)
+
+    def test_email_case_does_not_defeat_deduplication(self):
+        self.create_customer(full_name="Ana", phone="+55 11 3", email="Ana@Example.com")
+        content = "full_name,phone,email\nAna,+55 11 4,ana@example.com\nBia,+55 11 5,Bia@Email.com\n"
+
+        response = self.upload("clientes.csv", content)
+
+        self.assertEqual((response.data["created"], response.data["duplicates"]), (1, 1))
+        # Saved as typed, like the create endpoint does
+        self.assertTrue(Customer.objects.filter(email="Bia@Email.com").exists())
+
+    def test_ndjson_import(self):
+        lines = [
+            json.dumps({"full_name": "Ana", "phone": "+55 11 1", "email": "ana@email.com"}),
+            "",
+            "{not json",
+            json.dumps({"full_name": "Bia", "phone": "+55 11 2", "email": "bia@email.com"}),
+        ]
+        response = self.upload("clientes.ndjson", "\n".join(lines))
+
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["errors"], [{"line": 3, "errors": {"detail": "Linha inválida"}}])
+
+    def test_export_streams_csv_and_ndjson(self):
+        self.create_customer(full_name="Maria, \"a\" Silva", email="maria@email.com")
+
+        response = self.client.get("/api/customer/export/", {"file_format": "csv"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ["id", "full_name", "phone", "email", "created_at"])
+        self.assertEqual([row[1] for row in rows[1:]], ["Carlos Usuario Teste", "Maria, \"a\" Silva"])
+
+        response = self.client.get("/api/customer/export/", {"file_format": "ndjson"})
+        records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record["email"] for record in records], ["carlos@email.com", "maria@email.com"])
+
+    def test_export_is_scoped_to_the_user(self):
+        other = get_user_model().objects.create_user(username="other", password="12345678")
+        Customer.objects.create(full_name="Alheio", phone="1", email="a@a.com", created_by=other)
+
+        response = self.client.get("/api/customer/export/", {"file_format": "ndjson"})
+        self.assertEqual(len(b"".join(response.streaming_content).decode().splitlines()), 1)
+
+class TestAppointmentExport(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f"/api/establishment/{self.establishment.id}/appointments/export/"
+        self.paid = self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 10, 9, 0)))
+        UserPayment.objects.create(
+            customer=self.customer,
+            appointment=self.paid,
+            establishment=self.establishment,
+            stripe_checkout_id="cs_test_export",
+            price=self.paid.price,
+            currency="brl",
+            has_paid=True,
+        )
+        self.unpaid = self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 11, 9, 0)))
+        self.create_appointment(start_at=timezone.make_aware(datetime(2026, 2, 1, 9, 0)))
+        self.authenticate_client()
+
+    def test_streams_appointments_with_customer_and_payment_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"start": "2026-01-01", "end": "2026-01-31", "file_format": "ndjson"})
+            records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(len([q for q in queries if "api_rest_appointment" in q["sql"]]), 1)
+        self.assertEqual([record["appointment_id"] for record in records], [self.paid.id, self.unpaid.id])
+        self.assertEqual(records[0]["customer_name"], "Carlos Usuario Teste")
+        self.assertEqual((records[0]["stripe_checkout_id"], records[0]["payment_has_paid"]), ("cs_test_export", True))
+        self.assertIsNone(records[1]["payment_id"])
+
+    def test_csv_header(self):
+        response = self.client.get(self.url, {"start": "2026-01-10", "end": "2026-01-10"})
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:3], ["appointment_id", "start_at", "end_at"])
+        self.assertEqual(len(rows), 2)
+
+    def test_other_users_establishment(self):
+        other = get_user_model().objects.create_user(username="other", password="12345678")
+        self.client.force_authenticate(other)
+        response = self.client.get(self.url, {"start": "2026-01-01", "end": "2026-01-31"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command("export_appointments", self.establishment.id, start="2026-01-01", end="2026-12-31",
+                     file_format="ndjson", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+@mock.patch("stripe.Webhook.construct_event", side_effect=construct_event_stub)
+class TestEstablishmentCache(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.authenticate_client()
+
+    def establishment_queries(self, queries):
+        # Owner -> establishment lookups; full_clean() still checks the location FK by id
+        return [q for q in queries if 'FROM "api_rest_establishment"' in q["sql"] and '"owner_id"' in q["sql"]]
+
+    def get_status(self):
+        return self.client.get("/api/stripe/status").data["status"]
+
+    def test_repeated_requests_do_not_query_establishments(self, construct_event):
+        self.get_status()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_status(), "Desconetcado")
+            response = self.client.post("/api/appointment/", {
+                "customer_id": self.customer.id,
+                "start_at": "2026-03-01T10:00:00Z",
+                "price": "10.00",
+                "payment_method": "PIX",
+            }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.establishment_queries(queries), [])
+        self.assertEqual(Appointment.objects.get(id=response.data["id"]).location_id, self.establishment.id)
+
+    def test_saving_an_establishment_invalidates(self, construct_event):
+        self.assertEqual(self.get_status(), "Desconetcado")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.establishment.stripe_details_submitted = True
+            self.establishment.save()
+        self.assertEqual(self.get_status(), "Pendente")
+
+    def test_account_updated_webhook_invalidates(self, construct_event):
+        self.establishment.stripe_account_id = "acct_cache"
+        self.establishment.save()
+        self.assertEqual(self.get_status(), "Desconetcado")
+
+        event = {
+            "id": "evt_cache",
+            "type": "account.updated",
+            "data": {"object": {
+                "id": "acct_cache", "charges_enabled": True, "payouts_enabled": True, "details_submitted": True,
+            }},
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.generic("POST", "/stripe/webhook/", json.dumps(event),
+                                content_type="application/json", HTTP_STRIPE_SIGNATURE="t=0,v1=stub")
+        self.assertEqual(self.get_status(), "Conectado")
+
+    def test_update_does_not_write_back_stale_cached_columns(self, construct_event):
+        self.get_status()
+        # Another worker flips the Stripe flags: this process's cache is not invalidated
+        Establishment.objects.filter(pk=self.establishment.pk).update(
+            stripe_charges_enabled=True, stripe_payouts_enabled=True, stripe_details_submitted=True)
+
+        response = self.client.patch("/api/update_establishment/", {"name": "Novo Nome"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.establishment.refresh_from_db()
+        self.assertEqual(self.establishment.name, "Novo Nome")
+        self.assertTrue(self.establishment.stripe_charges_enabled)
+        self.assertTrue(self.establishment.stripe_payouts_enabled)
+
+    def test_other_users_establishment_is_not_found(self, construct_event):
+        other = get_user_model().objects.create_user(username="other", password="12345678")
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/api/establishment/{self.establishment.id}/slots/", {"start": "2026-03-01"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+@mock.patch("stripe.Webhook.construct_event", side_effect=construct_event_stub)
+class TestStripeStatusConditional(EstablishmentFixturesMixin, APITestCase):
+    url = "/api/stripe/status"
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.establishment.stripe_account_id = "acct_status"
+        self.establishment.save()
+        self.authenticate_client()
+
+    def test_polling_with_validators_gets_304(self, construct_event):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "Desconetcado")
+        self.assertIn("private", response["Cache-Control"])
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again["ETag"], response["ETag"])
+
+        since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_account_updated_changes_the_etag(self, construct_event):
+        etag = self.client.get(self.url)["ETag"]
+
+        event = {
+            "id": "evt_status",
+            "type": "account.updated",
+            "data": {"object": {
+                "id": "acct_status", "charges_enabled": False, "payouts_enabled": False, "details_submitted": True,
+            }},
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.generic("POST", "/stripe/webhook/", json.dumps(event),
+                                content_type="application/json", HTTP_STRIPE_SIGNATURE="t=0,v1=stub")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "Pendente")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_connect_return_invalidates(self, construct_event):
+        self.assertEqual(self.client.get(self.url).data["status"], "Desconetcado")
+        token = self.establishment.stripe_onboarding_token
+        account = {
+            "charges_enabled": True, "payouts_enabled": True, "details_submitted": True,
+            "requirements": {"currently_due": [], "past_due": [], "pending_verification": []},
+        }
+
+        with mock.patch("api_rest.services.stripe_gateway.retrieve_account", return_value=account), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.get("/api/stripe/connect/return/", {"state": str(token)})
+
+        self.assertEqual(self.client.get(self.url).data["status"], "Conectado")
+
+    def test_checkout_uses_the_integration_status(self, construct_event):
+        appointment = self.create_appointment()
+        response = self.client.get(f"/api/payments/checkout/{appointment.id}/")
+        self.assertIn("não está integrada", response.data["message"])
+
+class TestConditionalGet(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.appointment = self.create_appointment()
+        self.authenticate_client()
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached.content, b"")
+        # Only the aggregate behind the validators (plus the JWT user lookup) runs
+        self.assertEqual(len(queries), 2)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def bump(self, instance):
+        # save() stamps updated_at through auto_now
+        return lambda: instance.save()
+
+    def test_appointment_list_changes_with_the_customer(self):
+        self.assertRevalidates("/api/appointment/", self.bump(self.customer))
+
+    def test_appointment_list_changes_on_insert_and_cancel(self):
+        self.assertRevalidates("/api/appointment/", lambda: self.create_appointment(
+            start_at=timezone.make_aware(datetime(2026, 1, 11, 9, 0)),
+        ))
+        self.assertRevalidates("/api/appointment/", lambda: self.client.delete(f"/api/appointment/{self.appointment.id}/"))
+
+    def test_detail_views(self):
+        self.assertRevalidates(f"/api/appointment/{self.appointment.id}/", self.bump(self.appointment))
+        self.assertRevalidates(f"/api/customer/{self.customer.id}/", lambda: self.client.patch(
+            f"/api/customer/{self.customer.id}/", {"full_name": "Outro"}, format="json",
+        ))
+
+    def test_customer_list_and_establishments(self):
+        self.assertRevalidates("/api/customer/", lambda: self.create_customer(email="novo@email.com"))
+        self.assertRevalidates("/api/establishment/", self.bump(self.establishment))
+
+    def test_list_after_a_hard_delete_is_not_304_on_if_modified_since(self):
+        other = self.create_customer(email="outro@email.com")
+        response = self.client.get("/api/customer/")
+        self.assertNotIn("Last-Modified", response)
+        self.assertIn("Last-Modified", self.client.get(f"/api/customer/{self.customer.id}/"))
+
+        self.client.delete(f"/api/customer/{other.id}/")
+        # Later than every updated_at left in the list
+        tomorrow = http_date((timezone.now() + timedelta(days=1)).timestamp())
+        response = self.client.get("/api/customer/", HTTP_IF_MODIFIED_SINCE=tomorrow)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_query_string_is_part_of_the_etag(self):
+        etag = self.client.get("/api/customer/")["ETag"]
+        response = self.client.get("/api/customer/", {"q": "Carlos"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_detail_is_still_404(self):
+        response = self.client.get("/api/appointment/999999/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", response)
+
+class TestFastJSON(EstablishmentFixturesMixin, APITestCase):
+    def test_renderer_output_matches_drf(self):
+        data = {
+            "text": "São João \u2028 \u2029 \"quoted\" <tag>",
+            "price": Decimal("10.50"),
+            "moment": timezone.make_aware(datetime(2026, 1, 10, 9, 30, 15, 123456)),
+            "day": datetime(2026, 1, 10).date(),
+            "time": time(9, 30, 15, 999),
+            "token": uuid.UUID(int=7),
+            "lazy": gettext_lazy("Cancelado"),
+            "nested": [{1: None, "b": [True, False, 1.5]}],
+            # Beyond 64 bits orjson refuses to encode: JSONRenderer takes over
+            "big": 2 ** 70,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+        appointments = AppointmentSerializer([self.create_appointment()], many=True).data
+        self.assertEqual(FastJSONRenderer().render(appointments), JSONRenderer().render(appointments))
+
+    def test_parser_falls_back_to_stdlib(self):
+
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(BytesIO(b'{"a": [1, "\\u00e9"]}')), {"a": [1, "é"]})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"a": '))
+
+    def test_api_uses_the_fast_renderer(self):
+        self.authenticate_client()
+        response = self.client.get("/api/appointment/")
+        self.assertEqual(type(response.accepted_renderer).__name__, "FastJSONRenderer")
+        self.assertEqual(response.json()["results"], [])
+
+class TestValuesReaders(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_appointment(observation="Observação", price=Decimal("10.5"))
+        self.create_appointment(
+            start_at=timezone.make_aware(datetime(2026, 6, 1, 23, 30, 15, 250000)),
+            status=Appointment.Status.CANCELED, payment_method="CARD", number_people=3,
+        )
+        undated = self.create_appointment(start_at=timezone.make_aware(datetime(2026, 7, 1, 9, 0)))
+        Appointment.objects.filter(pk=undated.pk).update(start_at=None, end_at=None, observation="")
+        self.authenticate_client()
+
+    def assertSameBytes(self, reader, serializer_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        rows = reader.rows(queryset.values(*reader.columns()))
+        self.assertEqual(JSONRenderer().render(rows), expected)
+
+    def test_appointment_rows_match_the_serializer(self):
+        queryset = Appointment.objects.order_by("id")
+        self.assertSameBytes(AppointmentReader(), AppointmentSerializer, queryset)
+
+        with timezone.override("UTC"):
+            self.assertSameBytes(AppointmentReader(), AppointmentSerializer, queryset)
+
+    def test_customer_rows_match_the_serializer(self):
+        self.create_customer(full_name="Zé  ", email="ze@email.com")
+        self.assertSameBytes(CustomerReader(), CustomerSerializer, Customer.objects.order_by("id"))
+
+    def test_list_endpoints_match_the_serializer(self):
+        response = self.client.get("/api/appointment/")
+        expected = AppointmentSerializer(Appointment.objects.order_by("-created_at", "-id"), many=True).data
+        self.assertEqual(JSONRenderer().render(response.data["results"]), JSONRenderer().render(expected))
+
+        response = self.client.get(f"/api/filter-appointment-customer/{self.customer.id}/")
+        self.assertEqual(len(response.data), 3)
+
+    def test_cursor_pagination_over_values(self):
+        for n in range(4):
+            self.create_appointment(start_at=timezone.make_aware(datetime(2026, 2, 1 + n, 9, 0)))
+
+        ids, url = [], "/api/appointment/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            ids += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(ids, list(Appointment.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+class TestSparseFieldsets(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.appointment = self.create_appointment(observation="Longa observação")
+        self.authenticate_client()
+
+    def test_fields_prunes_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/appointment/", {"fields": "id,start_at,status,customer_name"})
+
+        # Keys keep the serializer order
+        self.assertEqual(list(response.data["results"][0]), ["id", "start_at", "customer_name", "status"])
+        select = [q["sql"] for q in queries if q["sql"].startswith('SELECT "api_rest_appointment"."id"')][-1]
+        self.assertNotIn('"observation"', select)
+        self.assertNotIn('"api_rest_establishment"', select)
+
+    def test_omit(self):
+        response = self.client.get("/api/customer/", {"omit": "created_at,updated_at"})
+        self.assertEqual(list(response.data["results"][0]), ["id", "full_name", "phone", "email"])
+
+    def test_pagination_still_works_without_the_ordering_columns(self):
+        self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 11, 9, 0)))
+        response = self.client.get("/api/appointment/", {"fields": "id", "page_size": 1})
+        self.assertEqual(list(response.data["results"][0]), ["id"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"], [{"id": self.appointment.id}])
+
+    def test_detail_views(self):
+        response = self.client.get(f"/api/appointment/{self.appointment.id}/", {"fields": "id,status_label"})
+        self.assertEqual(response.data, {"id": self.appointment.id, "status_label": "Agendado"})
+
+        full = self.client.get(f"/api/appointment/{self.appointment.id}/")
+        expected = AppointmentSerializer(self.appointment).data
+        self.assertEqual(JSONRenderer().render(full.data), JSONRenderer().render(expected))
+
+        response = self.client.get(f"/api/customer/{self.customer.id}/", {"fields": "email"})
+        self.assertEqual(response.data, {"email": "carlos@email.com"})
+
+        self.assertEqual(self.client.get("/api/customer/999999/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_field(self):
+        response = self.client.get("/api/appointment/", {"fields": "id,password"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("password", str(response.data["fields"]))
+
+    def test_omitting_everything(self):
+        response = self.client.get("/api/customer/", {"fields": "id", "omit": "id"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TestAppointmentFilters(EstablishmentFixturesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.monday = self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 5, 9, 0)))
+        self.sunday = self.create_appointment(
+            start_at=timezone.make_aware(datetime(2026, 1, 11, 23, 0)), status="CONFIRMED", payment_method="CARD",
+        )
+        self.next_week = self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 12, 0, 0)))
+        self.canceled = self.create_appointment(start_at=timezone.make_aware(datetime(2026, 1, 7, 9, 0)), status="CANCELED")
+        self.authenticate_client()
+
+    def ids(self, url="/api/appointment/", **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        results = response.data["results"] if "results" in response.data else response.data
+        return {row["id"] for row in results}
+
+    def test_week_range_is_inclusive_of_both_days(self):
+        self.assertEqual(self.ids(start_from="2026-01-05", start_to="2026-01-11"),
+                         {self.monday.id, self.sunday.id, self.canceled.id})
+
+    def test_status_payment_method_and_location(self):
+        self.assertEqual(self.ids(status="scheduled,CONFIRMED", start_to="2026-01-11"), {self.monday.id, self.sunday.id})
+        self.assertEqual(self.ids(payment_method="CARD"), {self.sunday.id})
+        self.assertEqual(self.ids(location=self.establishment.id + 1), set())
+
+    def test_invalid_filters(self):
+        self.assertEqual(self.client.get("/api/appointment/", {"status": "PAID"}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get("/api/appointment/", {"start_from": "2026-01-10", "start_to": "2026-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_week_query_uses_a_sargable_range(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.ids(start_from="2026-01-05", start_to="2026-01-11", status="SCHEDULED")
+        select = [q["sql"] for q in queries if q["sql"].startswith('SELECT "api_rest_appointment"."id"')][-1]
+        self.assertIn('"api_rest_appointment"."start_at" >= ', select)
+        self.assertIn('"api_rest_appointment"."start_at" < ', select)
+        self.assertNotIn("django_datetime", select)
+
+    def test_filter_by_customer_is_scoped_to_the_user(self):
+        url = f"/api/filter-appointment-customer/{self.customer.id}/"
+        self.assertEqual(self.ids(url, status="CONFIRMED"), {self.sunday.id})
+
+        other = get_user_model().objects.create_user(username="other", password="12345678")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.ids(url), set())
+
+
+class TestStripeGateway(FakeStripeMixin, EstablishmentFixturesMixin, APITestCase):
+    def account(self, account_id="acct_1"):
+        return {
+            "id": account_id, "object": "account",
+            "charges_enabled": True, "payouts_enabled": True, "details_submitted": True,
+            "requirements": {"currently_due": [], "past_due": [], "pending_verification": []},
+        }
+
+    def test_connection_is_reused_between_calls(self):
+        self.stripe.default = (200, self.account(), 0)
+        stripe_gateway.retrieve_account("acct_1")
+        stripe_gateway.retrieve_account("acct_1")
+
+        self.assertEqual(len(self.stripe.requests), 2)
+        self.assertEqual(self.stripe.requests[0]["port"], self.stripe.requests[1]["port"])
+        self.assertEqual(self.stripe.requests[0]["headers"]["Authorization"], "Bearer sk_test_fake")
+
+    def test_server_errors_are_retried_with_the_same_idempotency_key(self):
+        self.stripe.error(500)
+        self.stripe.error(503)
+        self.stripe.reply(200, {"id": "cs_1", "object": "checkout.session", "url": "https://checkout"})
+
+        session = stripe_gateway.create_checkout_session({"mode": "payment"}, idempotency_key="payment-1")
+
+        self.assertEqual(session["url"], "https://checkout")
+        keys = {request["headers"]["Idempotency-Key"] for request in self.stripe.requests}
+        self.assertEqual((len(self.stripe.requests), keys), (3, {"payment-1"}))
+        self.assertFalse(stripe_gateway.get_breaker().is_open)
+
+    def test_read_timeout_is_bounded(self):
+        self.stripe.default = (200, self.account(), 1)
+
+        started = monotonic()
+        with self.assertRaises(stripe_gateway.StripeUnavailable):
+            stripe_gateway.retrieve_account("acct_1")
+
+        self.assertEqual(len(self.stripe.requests), 3)
+        self.assertLess(monotonic() - started, 2)
+
+    def test_client_errors_do_not_open_the_circuit(self):
+        for _ in range(3):
+            self.stripe.error(404, "No such account", "invalid_request_error")
+            with self.assertRaises(stripe.InvalidRequestError):
+                stripe_gateway.retrieve_account("acct_missing")
+
+        self.assertFalse(stripe_gateway.get_breaker().is_open)
+
+    def test_circuit_opens_and_fails_fast(self):
+        self.stripe.default = (500, {"error": {"type": "api_error", "message": "Erro"}}, 0)
+        for _ in range(2):
+            with self.assertRaises(stripe_gateway.StripeUnavailable):
+                stripe_gateway.retrieve_account("acct_1")
+        sent = len(self.stripe.requests)
+
+        self.establishment.stripe_onboarding_token = uuid.uuid4()
+        self.establishment.stripe_account_id = "acct_1"
+        self.establishment.save()
+        response = self.client.get("/api/stripe/connect/return/", {"state": str(self.establishment.stripe_onboarding_token)})
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(len(self.stripe.requests), sent)
+
+    def test_half_open_lets_one_trial_through(self):
+        now = [0]
+        breaker = stripe_gateway.CircuitBreaker(threshold=2, reset_timeout=30, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        now[0] = 31
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        now[0] = 62
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow() and breaker.allow())
+
+    def test_unexpected_error_settles_the_trial(self):
+        now = [0]
+        stripe_gateway._breaker = breaker = stripe_gateway.CircuitBreaker(threshold=1, reset_timeout=30,
+                                                                          clock=lambda: now[0])
+        broken = mock.Mock(retrieve=mock.Mock(side_effect=KeyError("id")))
+        breaker.record_failure()
+
+        # The half-open trial blows up with something that is not a StripeError
+        now[0] = 31
+        with self.assertRaises(KeyError):
+            stripe_gateway._call(broken, "retrieve", "acct_1")
+        self.assertFalse(breaker.allow())
+
+        now[0] = 62
+        self.stripe.default = (200, self.account(), 0)
+        self.assertEqual(stripe_gateway.retrieve_account("acct_1")["id"], "acct_1")
+        self.assertFalse(breaker.is_open)
+
+    def test_connect_return_reads_the_account_through_the_gateway(self):
+        self.stripe.default = (200, self.account("acct_ok"), 0)
+        self.establishment.stripe_onboarding_token = uuid.uuid4()
+        self.establishment.stripe_account_id = "acct_ok"
+        self.establishment.save()
+
+        response = self.client.get("/api/stripe/connect/return/", {"state": str(self.establishment.stripe_onboarding_token)})
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(self.stripe.requests[0]["path"], "/v1/accounts/acct_ok")
+        self.establishment.refresh_from_db()
+        self.assertTrue(self.establishment.stripe_charges_enabled)
+
+
+class TestAsyncCheckout(FakeStripeMixin, EstablishmentFixturesMixin, APITestCase):
+    stripe_settings = {"STRIPE_CHECKOUT_ASYNC": True, "STRIPE_CHECKOUT_MAX_ATTEMPTS": 2}
+    session = {"id": "cs_async", "object": "checkout.session", "url": "https://checkout.stripe.test/cs_async"}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.establishment.stripe_account_id = "acct_async"
+        self.establishment.stripe_charges_enabled = True
+        self.establishment.stripe_payouts_enabled = True
+        self.establishment.stripe_details_submitted = True
+        self.establishment.save()
+        self.appointment = self.create_appointment()
+        self.authenticate_client()
+
+    def checkout(self):
+        return self.client.get(f"/api/payments/checkout/{self.appointment.id}/")
+
+    def test_checkout_reserves_the_payment_and_answers_202(self):
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response["Location"], response.data["status_url"])
+        payment = UserPayment.objects.get(appointment=self.appointment)
+        self.assertEqual((payment.checkout_status, payment.amount_cents), (UserPayment.CheckoutStatus.PENDING, 6000))
+        self.assertEqual(self.stripe.requests, [])
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        self.assertIn("ja foi enviado", self.checkout().data["message"])
+
+    def test_worker_creates_the_session_with_an_idempotency_key(self):
+        token = self.checkout().data["token"]
+        self.stripe.reply(200, self.session)
+
+        call_command("process_checkout_sessions", stdout=StringIO())
+
+        payment = UserPayment.objects.get(token=token)
+        self.assertEqual(payment.checkout_status, UserPayment.CheckoutStatus.READY)
+        self.assertEqual((payment.stripe_checkout_id, payment.checkout_url), ("cs_async", self.session["url"]))
+        self.assertEqual(self.stripe.requests[0]["headers"]["Idempotency-Key"], f"checkout-{token}")
+        self.assertIn(self.session["url"], OutboundEmail.objects.get().body)
+
+    def test_status_long_polls_until_the_session_exists(self):
+        url = self.checkout().data["status_url"]
+        self.assertEqual(self.client.get(url).data["status"], UserPayment.CheckoutStatus.PENDING)
+
+        self.stripe.reply(200, self.session)
+        with mock.patch("api_rest.services.checkout_sessions.time.sleep",
+                        side_effect=lambda seconds: checkout_sessions.process_pending()) as sleep:
+            response = self.client.get(url, {"wait": 5})
+
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response.data["status"], UserPayment.CheckoutStatus.READY)
+        self.assertEqual(response.data["checkout_url"], self.session["url"])
+
+    @override_settings(STRIPE_CHECKOUT_MAX_WAIT=20, STRIPE_CHECKOUT_MAX_WAIT_SYNC=1)
+    def test_sync_status_caps_the_wait(self):
+        url = self.checkout().data["status_url"]
+
+        with mock.patch("api_rest.services.checkout_sessions.wait_for_status", return_value=None) as wait:
+            self.client.get(url, {"wait": 20})
+
+        self.assertEqual(wait.call_args.args[2], 1)
+
+    def test_status_is_scoped_to_the_user(self):
+        url = self.checkout().data["status_url"]
+        other = get_user_model().objects.create_user(username="other", password="12345678")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_checkout_of_another_users_appointment_is_not_found(self):
+        other = get_user_model().objects.create_user(username="other", password="12345678")
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.checkout().status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(UserPayment.objects.exists())
+
+    def test_outage_is_retried_then_gives_up(self):
+        token = self.checkout().data["token"]
+        self.stripe.default = (500, {"error": {"type": "api_error", "message": "Erro"}}, 0)
+
+        self.assertEqual(checkout_sessions.process_pending(), (0, 1))
+        payment = UserPayment.objects.get(token=token)
+        self.assertEqual((payment.checkout_status, payment.attempts), (UserPayment.CheckoutStatus.PENDING, 1))
+        self.assertEqual(checkout_sessions.process_pending(), (0, 0))
+
+        UserPayment.objects.filter(token=token).update(next_attempt_at=timezone.now())
+        stripe_gateway.get_breaker().record_success()
+        checkout_sessions.process_pending()
+        self.assertEqual(UserPayment.objects.get(token=token).checkout_status, UserPayment.CheckoutStatus.FAILED)
+
+    def test_open_circuit_postpones_without_spending_attempts(self):
+        token = self.checkout().data["token"]
+        breaker = stripe_gateway.get_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        for _ in range(3):
+            UserPayment.objects.filter(token=token).update(next_attempt_at=timezone.now())
+            self.assertEqual(checkout_sessions.process_pending(), (0, 1))
+
+        payment = UserPayment.objects.get(token=token)
+        self.assertEqual((payment.checkout_status, payment.attempts), (UserPayment.CheckoutStatus.PENDING, 0))
+        # Back when the circuit lets a trial call through
+        self.assertGreater(payment.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(self.stripe.requests, [])
+
+    def test_rejected_session_fails_and_can_be_sent_again(self):
+        self.checkout()
+        self.stripe.error(400, "Invalid destination", "invalid_request_error")
+
+        self.assertEqual(checkout_sessions.process_pending(), (0, 1))
+        self.assertEqual(UserPayment.objects.get().checkout_status, UserPayment.CheckoutStatus.FAILED)
+        self.assertEqual(self.checkout().status_code, status.HTTP_202_ACCEPTED)
+
+    @override_settings(STRIPE_CHECKOUT_ASYNC=False)
+    def test_synchronous_mode_still_creates_the_session_inline(self):
+        self.stripe.reply(200, self.session)
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = UserPayment.objects.get()
+        self.assertEqual((payment.checkout_status, payment.stripe_checkout_id), (UserPayment.CheckoutStatus.READY, "cs_async"))
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+
+@override_settings(ROOT_URLCONF="project.urls_async")
+class TestAsyncStripeViews(FakeStripeMixin, EstablishmentFixturesMixin, APITestCase):
+    session = {"id": "cs_async_view", "object": "checkout.session", "url": "https://checkout.stripe.test/cs_async_view"}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.auth = {"Authorization": f"Bearer {self.access_token}"}
+
+    def connect(self, **fields):
+        for field, value in {"stripe_account_id": "acct_async", "stripe_charges_enabled": True,
+                             "stripe_payouts_enabled": True, "stripe_details_submitted": True, **fields}.items():
+            setattr(self.establishment, field, value)
+        self.establishment.save()
+
+    def test_stripe_endpoints_resolve_to_async_views(self):
+        self.assertIs(resolve("/api/stripe/connect/return/").func.view_class, async_views.AsyncStripeConnectReturn)
+        self.assertIs(resolve("/stripe/webhook/").func, astripe_webhook)
+        self.assertIs(resolve("/api/stripe/status").func.view_class, StripeCheckStatusIntegration)
+
+    async def test_requests_without_a_token_get_401(self):
+        response = await self.async_client.get("/api/establishment/stripe/connect/")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+        self.assertIn("detail", response.json())
+
+    async def test_connect_creates_the_account_and_the_onboarding_link(self):
+        self.stripe.reply(200, {"id": "acct_new", "object": "account"})
+        self.stripe.reply(200, {"object": "account_link", "url": "https://connect.stripe.test/onboarding"})
+
+        response = await self.async_client.get("/api/establishment/stripe/connect/", headers=self.auth)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"url": "https://connect.stripe.test/onboarding", "connected": False})
+        self.assertEqual([request["path"] for request in self.stripe.requests], ["/v1/accounts", "/v1/account_links"])
+        establishment = await Establishment.objects.aget(pk=self.establishment.pk)
+        self.assertEqual(establishment.stripe_account_id, "acct_new")
+        self.assertIsNotNone(establishment.stripe_onboarding_token)
+
+    async def test_checkout_creates_the_session_and_queues_the_email(self):
+        await sync_to_async(self.connect)()
+        appointment = await sync_to_async(self.create_appointment)()
+        self.stripe.reply(200, self.session)
+
+        response = await self.async_client.get(f"/api/payments/checkout/{appointment.id}/", headers=self.auth)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = await UserPayment.objects.aget(appointment=appointment)
+        self.assertEqual((payment.stripe_checkout_id, payment.checkout_url), ("cs_async_view", self.session["url"]))
+        self.assertEqual(await OutboundEmail.objects.acount(), 1)
+
+    async def test_checkout_of_another_users_appointment_is_not_found(self):
+        await sync_to_async(self.connect)()
+        appointment = await sync_to_async(self.create_appointment)()
+        other = await get_user_model().objects.acreate(username="other")
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(other).access_token}"}
+
+        response = await self.async_client.get(f"/api/payments/checkout/{appointment.id}/", headers=headers)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(await UserPayment.objects.aexists())
+        self.assertEqual(self.stripe.requests, [])
+
+    async def test_connect_return_applies_the_account(self):
+        token = uuid.uuid4()
+        await sync_to_async(self.connect)(stripe_charges_enabled=False, stripe_onboarding_token=token)
+        self.stripe.reply(200, {"id": "acct_async", "object": "account", "charges_enabled": True,
+                                "payouts_enabled": True, "details_submitted": True})
+
+        response = await self.async_client.get("/api/stripe/connect/return/", {"state": str(token)})
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        establishment = await Establishment.objects.aget(pk=self.establishment.pk)
+        self.assertTrue(establishment.stripe_charges_enabled)
+        self.assertIsNone(establishment.stripe_onboarding_token)
+
+        missing = await self.async_client.get("/api/stripe/connect/return/")
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(STRIPE_CHECKOUT_ASYNC=True)
+    async def test_status_long_poll_yields_the_event_loop(self):
+        await sync_to_async(self.connect)()
+        appointment = await sync_to_async(self.create_appointment)()
+        accepted = await self.async_client.get(f"/api/payments/checkout/{appointment.id}/", headers=self.auth)
+        self.assertEqual(accepted.status_code, status.HTTP_202_ACCEPTED)
+
+        self.stripe.reply(200, self.session)
+
+        async def worker_runs(seconds):
+            await sync_to_async(checkout_sessions.process_pending)()
+
+        with mock.patch("api_rest.services.checkout_sessions.asyncio.sleep", side_effect=worker_runs) as sleep:
+            response = await self.async_client.get(accepted["Location"], {"wait": 5}, headers=self.auth)
+
+        self.assertEqual(sleep.await_count, 1)
+        self.assertEqual(response.json()["status"], UserPayment.CheckoutStatus.READY)
+
+    @mock.patch("stripe.Webhook.construct_event", side_effect=construct_event_stub)
+    async def test_webhook_records_the_event(self, construct_event):
+        event = {"id": "evt_async", "type": "customer.created", "data": {"object": {"id": "cus_1"}}}
+
+        response = await self.async_client.post("/stripe/webhook/", json.dumps(event), content_type="application/json",
+                                                 headers={"Stripe-Signature": "t=0,v1=stub"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(await StripeEvent.objects.filter(event_id="evt_async").aexists())
+
+    async def test_concurrent_calls_overlap(self):
+        self.stripe.default = (200, {"id": "acct_slow", "object": "account"}, 0.2)
+
+        started = monotonic()
+        accounts = await asyncio.gather(*(stripe_gateway.aretrieve_account("acct_slow") for _ in range(10)))
+
+        self.assertEqual({account["id"] for account in accounts}, {"acct_slow"})
+        # Ten 0.2s calls one after another would take 2s
+        self.assertLess(monotonic() - started, 1)
+
+
+class TestDatabasePooling(TestCase):
+
+    def load_settings(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_module("project.settings")
+
+    def test_persistent_connections_by_default(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("DB_POOL_MODE", None)
+            database = runpy.run_module("project.settings")["DATABASES"]["default"]
+
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertFalse(database["DISABLE_SERVER_SIDE_CURSORS"])
+        self.assertNotIn("OPTIONS", database)
+
+    def test_pool_mode_sizes_the_psycopg_pool(self):
+        database = self.load_settings(DB_POOL_MODE="pool", DB_POOL_MIN_SIZE="1", DB_POOL_MAX_SIZE="8")["DATABASES"]["default"]
+
+        self.assertEqual(database["OPTIONS"]["pool"], {"min_size": 1, "max_size": 8, "timeout": 10.0})
+        # Django refuses a pool with persistent connections
+        self.assertNotIn("CONN_MAX_AGE", database)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+
+    def test_pgbouncer_mode_disables_server_side_cursors(self):
+        database = self.load_settings(DB_POOL_MODE="pgbouncer", DB_CONN_MAX_AGE="300")["DATABASES"]["default"]
+
+        self.assertEqual(database["CONN_MAX_AGE"], 300)
+        self.assertTrue(database["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_none_mode_connects_per_request(self):
+        database = self.load_settings(DB_POOL_MODE="none")["DATABASES"]["default"]
+
+        self.assertNotIn("CONN_MAX_AGE", database)
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings(DB_POOL_MODE="bouncer")
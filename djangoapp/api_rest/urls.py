@@ -15,13 +15,17 @@ urlpatterns = [
     # URL For customera www.yourdomain.com/api/customer
     path('customer/', views.Customers.as_view(), name='customers'),
     path('customer/<int:pk>/', views.CustomerDetailView.as_view(), name='customers_detail_view'),
+    path('customer/import/', views.CustomerImport.as_view(), name='customers_import'),
+    path('customer/export/', views.CustomerExport.as_view(), name='customers_export'),
 
     # URL For appointments www.yourdomain.com/api/appointment
     path('appointment/', views.Appointments.as_view(), name='appointment'),
     path('appointment/<int:pk>/', views.AppointmentDetailView.as_view(), name='appointment_detail_view'),
+    path('appointment/bulk/', views.BulkAppointments.as_view(), name='appointment_bulk'),
 
     # URL stripe 
     path('payments/checkout/<int:pk>/', views.CreateCheckoutSession.as_view(), name='checkout'),
+    path('payments/checkout/status/<uuid:token>/', views.CheckoutSessionStatus.as_view(), name='checkout_status'),
     path("success/", views.SuccessView.as_view(), name="success"),
     path("success_connect_stripe/", views.StripeTemplateConnectSuccessful.as_view(), name="success_connect_stripe"),
     path("cancel/", views.CancelView.as_view(), name="cancel"),
@@ -32,8 +36,12 @@ urlpatterns = [
 
     path('establishment/stripe/connect/', views.EstablishmentStripeConnect.as_view(), name='establishment_connect_stripe'),
     path('establishment/', views.RegisterEstablishment.as_view(), name='establishment'),
+    path('establishment/<int:pk>/slots/', views.AvailableSlots.as_view(), name='establishment_slots'),
+    path('establishment/<int:pk>/appointments/export/', views.AppointmentExport.as_view(), name='establishment_appointments_export'),
     path('update_establishment/', views.UpdateEstablishment.as_view(), name='update_establishment'),
 
-    path('filter-appointment-customer/<int:customer_id>/', views.FilterAppointmentByCustomer.as_view(), name='filter_appointment')
+    path('filter-appointment-customer/<int:customer_id>/', views.FilterAppointmentByCustomer.as_view(), name='filter_appointment'),
+
+    path('dashboard/daily-summary/', views.DashboardSummary.as_view(), name='dashboard_daily_summary'),
 ]
 
@@ -13,28 +13,47 @@ from .serializers import (CustomerSerializer,
                         UpdateUserSerializers,
                         AuthPasswordResetSerializer,
                         AuthPasswordResetConfirmSerializer,
+                        DashboardSummaryQuerySerializer,
+                        AvailableSlotsQuerySerializer,
+                        BulkAppointmentSerializer,
+                        AppointmentFilterSerializer,
+                        ExportQuerySerializer,
+                        AppointmentExportQuerySerializer,
+                        CustomerImportSerializer,
+                        CheckoutStatusQuerySerializer,
                         )
-from django.db.models import Q, Sum
 from rest_framework import status
 from drf_spectacular.utils import extend_schema
-import stripe
 from django.conf import settings
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
-from .services.send_email import send_email, send_email_reset_password
-from decimal import Decimal, ROUND_HALF_UP
+from .services.send_email import send_email_reset_password
+from .services.search import search_customers, search_appointments, filter_appointments
+from .services.revenue import owner_total
+from .services.rollups import period_range, summarize
+from .services.slots import available_slots
+from .services.bulk_appointments import BulkError, apply_batch
+from .services.customer_import import EXPORT_FIELDS as CUSTOMER_EXPORT_FIELDS, import_customers
+from .services.streaming import guess_format, read_records, stream_response
+from .services import appointment_export
+from .services.establishments import get_user_establishment, user_establishment
+from .services import checkout_sessions, stripe_connect, stripe_gateway, stripe_status
+from .conditional import ConditionalGetMixin, not_modified, set_validators
+from .readers import AppointmentReader, CustomerReader, ValuesReadMixin
+from .pagination import CreatedAtCursorPagination
+from datetime import timedelta
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
+from django.utils import timezone
 
 import os
-import uuid
 
 User = get_user_model()
-DOMAIN = os.getenv("DOMAIN")
 DOMAIN_FRONT_END = os.getenv("DOMAIN_FRONT_END")
 
 class RegisterUser(APIView):
@@ -79,7 +98,7 @@ class UpdateEstablishment(UpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user.establishments.first()
+        return user_establishment(self.request.user, fresh=True)
 
 class UserTokenRefreshView(TokenRefreshView):
     def post(self, request, *args, **kwargs):
@@ -152,22 +171,19 @@ class LogOut(APIView):
         return response
 
 # POST /api/customers/
-# GET /api/customers/ (List using search terms like ?q= by full_name/phone/email)
-class Customers(ListCreateAPIView):
+# GET /api/customers/ (List using search terms like ?q= by full_name/phone/email, paginated with ?cursor=&page_size=)
+class Customers(ConditionalGetMixin, ValuesReadMixin, ListCreateAPIView):
     serializer_class = CustomerSerializer
+    reader = CustomerReader()
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         qs = Customer.objects.filter(created_by=self.request.user)
         q = self.request.query_params.get("q")
 
         if q:
-            qs = (qs
-                .filter(
-                Q(full_name__icontains=q) |
-                Q(phone__icontains=q) |
-                Q(email__icontains=q)
-                ))
+            qs = search_customers(qs, q)
         
         return qs
     
@@ -180,146 +196,170 @@ class Customers(ListCreateAPIView):
 # PUT /api/customers/id
 # PATCH /api/customers/id
 # DELET /api/customers/id
-class CustomerDetailView(RetrieveUpdateDestroyAPIView):
+class CustomerDetailView(ConditionalGetMixin, ValuesReadMixin, RetrieveUpdateDestroyAPIView):
     model = Customer
     serializer_class = CustomerSerializer
+    reader = CustomerReader()
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return Customer.objects.filter(created_by=self.request.user)
 
-class FilterAppointmentByCustomer(ListAPIView):
+# POST /api/customer/import/ (multipart "file", CSV or NDJSON with full_name, phone, email)
+class CustomerImport(APIView):
+    serializer_class = CustomerImportSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CustomerImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data["file"]
+        file_format = guess_format(upload, serializer.validated_data.get("file_format"))
+
+        report = import_customers(request.user, read_records(upload, file_format))
+        return Response(report, status=status.HTTP_200_OK)
+
+# GET /api/customer/export/?file_format=csv|ndjson
+class CustomerExport(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = ExportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        rows = (Customer.objects
+                .filter(created_by=request.user)
+                .order_by("id")
+                .values_list(*CUSTOMER_EXPORT_FIELDS)
+                .iterator(chunk_size=2000))
+        return stream_response(CUSTOMER_EXPORT_FIELDS, rows, serializer.validated_data["file_format"], "customers")
+
+def appointment_filters(request):
+    serializer = AppointmentFilterSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+class FilterAppointmentByCustomer(ConditionalGetMixin, ValuesReadMixin, ListAPIView):
     serializer_class = AppointmentSerializer
+    reader = AppointmentReader()
     permission_classes = [IsAuthenticated]
+    conditional_fields = ("updated_at", "customer__updated_at", "location__updated_at")
 
     def get_queryset(self):
         customer_id = self.kwargs["customer_id"]
-        return Appointment.objects.filter(customer_id=customer_id)
+        qs = Appointment.objects.filter(created_by=self.request.user, customer_id=customer_id).select_related("customer", "location")
+
+        return filter_appointments(qs, **appointment_filters(self.request))
 
 # POST /api/appointment/
-# GET /api/appointment/ (List using search terms like ?q= by start_at/end_at/customer_id/status)
-class Appointments(ListCreateAPIView):
+# GET /api/appointment/ (List using search terms like ?q= by start_at/end_at/customer_id/status, paginated with ?cursor=&page_size=)
+# Structured filters: ?start_from=YYYY-MM-DD&start_to=YYYY-MM-DD&status=SCHEDULED,CONFIRMED&payment_method=PIX&location=id
+class Appointments(ConditionalGetMixin, ValuesReadMixin, ListCreateAPIView):
     serializer_class = AppointmentSerializer
+    reader = AppointmentReader()
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    conditional_fields = ("updated_at", "customer__updated_at", "location__updated_at")
 
     permission_classes = (IsAuthenticated,)
     def get_queryset(self):
-        qs = Appointment.objects.filter(created_by=self.request.user)
+        qs = Appointment.objects.filter(created_by=self.request.user).select_related("customer", "location")
         q = self.request.query_params.get("q")
 
         if q:
-            qs = (qs
-                .filter(
-                Q(start_at__icontains=q) |
-                Q(customer__phone__icontains=q) |
-                Q(status__icontains=q)
-                ))
+            qs = search_appointments(qs, q)
         
-        return qs
+        return filter_appointments(qs, **appointment_filters(self.request))
 
 # GET /api/appointment/id
 # PUT /api/appointment/id
 # PATCH /api/appointment/id
 # DELET /api/appointment/id
-class AppointmentDetailView(RetrieveUpdateDestroyAPIView):
+class AppointmentDetailView(ConditionalGetMixin, ValuesReadMixin, RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = AppointmentSerializer
+    reader = AppointmentReader()
+    conditional_fields = ("updated_at", "customer__updated_at", "location__updated_at")
 
     def get_queryset(self):
-        return Appointment.objects.filter(created_by=self.request.user)
+        return Appointment.objects.filter(created_by=self.request.user).select_related("customer", "location")
 
     def destroy(self, request, *args, **kwargs):
         obj = self.get_object()
         obj.status = "CANCELED"
-        obj.save(update_fields=["status"])
+        obj.save(update_fields=["status", "updated_at"])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+# POST /api/appointment/bulk/
+# {"create": [{...}], "update": [{"id": 1, ...}], "cancel": [2, 3]} all or nothing, errors reported per item
+class BulkAppointments(APIView):
+    serializer_class = BulkAppointmentSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkAppointmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        establishment = user_establishment(request.user)
+        try:
+            result = apply_batch(request.user, establishment, **serializer.validated_data)
+        except BulkError as error:
+            return Response(error.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result, status=status.HTTP_200_OK)
+
     
 class CreateCheckoutSession(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request, pk):   
         
-        try:
-            appointment = Appointment.objects.get(id=pk)
-            establishment = get_object_or_404(Establishment, location=appointment)
-
-        except Appointment.DoesNotExist:
-            raise status.HTTP_404_NOT_FOUND
+        appointment = get_object_or_404(Appointment.objects.select_related("location", "customer"),
+                                        id=pk, created_by=request.user)
 
-        if not establishment.stripe_details_submitted:
-            return Response({
-                'message': 'Sua conta não está integrada com a Stripe, acesse configurações e clique em integrar com a stripe',
-            })
+        reason = checkout_sessions.blocked_reason(appointment)
+        if reason:
+            return Response({'message': reason})
 
-        elif not (establishment.stripe_charges_enabled and establishment.stripe_payouts_enabled):
-            return Response({
-                'message': 'Sua conta esta pendente de verificação pela de identidade pela Stripe, pode levar até 48h',
-            })
+        if settings.STRIPE_CHECKOUT_ASYNC:
+            # Only reserve the payment: process_checkout_sessions talks to Stripe and sends the email
+            payment = checkout_sessions.reserve(appointment)
+            status_url = request.build_absolute_uri(reverse("api_rest:checkout_status", args=[payment.token]))
+            return Response(checkout_sessions.accepted_body(payment, status_url),
+                            status=status.HTTP_202_ACCEPTED, headers={"Location": status_url})
 
-        if UserPayment.objects.filter(appointment=appointment).exists():
-            return Response({
-                'message': 'este agendamento ja foi enviado para pagamento. Solicite ao cliente para verificar sua caixa de email',
-            })
+        # Crete page in stripe for payment
+        unit_amount = checkout_sessions.amount_cents(appointment.price)
+        session = stripe_gateway.create_checkout_session(checkout_sessions.session_params(appointment, unit_amount))
 
-        # Get cutomer create appointment
-        customer = appointment.customer
-        unit_amount = int((Decimal(str(appointment.price)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+        # Save local register talking "I started payment"
+        checkout_sessions.record_session(appointment, session, unit_amount)
 
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        # Crete page in stripe for payment
-        session = stripe.checkout.Session.create(
-            mode="payment",
-            line_items=[
-                {
-                    "price_data": {
-                        "currency":"brl",
-                        "product_data": {
-                            "name": f"Reserva em {appointment.location.name} em nome de {appointment.customer.full_name}",
-                            },
-                        "unit_amount": unit_amount,       
-                    }, 
-                    "quantity": 1,
-                }
-            ],
-            success_url=f"{DOMAIN}/api/success",
-            cancel_url=f"{DOMAIN}/api/cancel",
-            payment_intent_data={
-                "transfer_data": {"destination": establishment.stripe_account_id}
-            }
-        )
+        return Response({"message": checkout_sessions.CREATED_MESSAGE}, status=status.HTTP_201_CREATED)
+ 
+# GET /api/payments/checkout/status/<token>/?wait=seconds (long polls while the session is PENDING)
+class CheckoutSessionStatus(APIView):
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request, token):
+        # The wait holds a worker thread here: long polling belongs to the async view (ASGI)
+        serializer = CheckoutStatusQuerySerializer(data=request.query_params,
+                                                   context={"max_wait": settings.STRIPE_CHECKOUT_MAX_WAIT_SYNC})
+        serializer.is_valid(raise_exception=True)
 
-        # Save local register talking "I started payment"
-        payment = UserPayment.objects.create(
-            customer=customer,
-            appointment=appointment,
-            stripe_customer_id="",
-            stripe_checkout_id=session["id"],
-            stripe_product_id="",
-            amount_cents=int(unit_amount),
-            price=appointment.price,
-            currency="brl",
-            has_paid=False,
-            establishment=appointment.location,
-        )
+        payments = UserPayment.objects.filter(appointment__created_by=request.user)
+        row = checkout_sessions.wait_for_status(payments, token, serializer.validated_data["wait"])
+        if row is None:
+            return Response({"detail": "Pagamento não encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
-        url_checkout_stripe = session["url"]
-        send_email(url_checkout_stripe, appointment.id)
+        return Response(checkout_sessions.status_body(row), status=status.HTTP_200_OK)
 
-        return Response(
-            {
-                "message": f'Pagamento enviado com sucesso. Solicite ao seu cliente que verifique sua caixa de email',
-            },
-            status=status.HTTP_201_CREATED,
-        )
- 
 class SuccessView(TemplateView):
     template_name = "success_checkout.html"
 
 class CancelView(TemplateView):
     template_name = "cancel_checkout.html"
     
-class RegisterEstablishment(ListCreateAPIView):
+class RegisterEstablishment(ConditionalGetMixin, ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
     serializer_class = RegisterEstablishmentSerializer
@@ -327,43 +367,65 @@ class RegisterEstablishment(ListCreateAPIView):
     def get_queryset(self):
         return Establishment.objects.filter(owner=self.request.user)
 
+# GET /api/establishment/id/slots/?start=YYYY-MM-DD&end=YYYY-MM-DD&duration=minutes
+class AvailableSlots(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        establishment = get_user_establishment(request.user, pk, is_active=True)
+
+        serializer = AvailableSlotsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        duration = data.get("duration") or establishment.slot_minutes
+
+        slots = available_slots(establishment, data["start"], data["end"], timedelta(minutes=duration))
+
+        return Response({
+            "establishment_id": establishment.pk,
+            "duration": duration,
+            "days": [
+                {
+                    "date": day.isoformat(),
+                    "slots": [
+                        {"start_at": timezone.localtime(start).isoformat(), "end_at": timezone.localtime(end).isoformat()}
+                        for start, end in day_slots
+                    ],
+                }
+                for day, day_slots in slots.items()
+            ],
+        }, status=status.HTTP_200_OK)
+
+# GET /api/establishment/id/appointments/export/?start=YYYY-MM-DD&end=YYYY-MM-DD&file_format=csv|ndjson
+class AppointmentExport(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        establishment = get_user_establishment(request.user, pk)
+
+        serializer = AppointmentExportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        rows = appointment_export.export_rows(establishment, data["start"], data["end"])
+        filename = f"appointments-{data['start'].isoformat()}-{data['end'].isoformat()}"
+        return stream_response(appointment_export.FIELDS, rows, data["file_format"], filename)
+
 class EstablishmentStripeConnect(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         pk = request.query_params.get("establishment_id")
-        establishment = get_object_or_404(Establishment, pk=pk, owner=request.user)
+        establishment = get_user_establishment(request.user, pk, fresh=True)
         
-        if (establishment.stripe_charges_enabled and establishment.stripe_payouts_enabled):
-            return Response({"message": "Você já está conectado com a stripe", "connected": True})
+        if stripe_connect.is_connected(establishment):
+            return Response(stripe_connect.ALREADY_CONNECTED)
 
-        stripe.api_key = settings.STRIPE_SECRET_KEY
         if not establishment.stripe_account_id:
-            account = stripe.Account.create(
-                type="express",
-                country="BR",
-                email=request.user.email,
-                business_profile={
-                    "name": establishment.name,
-                },
-                capabilities = {
-                    "card_payments": {"requested": True},
-                    "transfers": {"requested": True},
-                }
-            )
-
-            establishment.stripe_account_id = account["id"]
-            establishment.save(update_fields=["stripe_account_id"])
+            account = stripe_gateway.create_account(stripe_connect.account_params(establishment, request.user.email))
+            stripe_connect.attach_account(establishment, account)
 
-            establishment.stripe_onboarding_token = uuid.uuid4()
-            establishment.save(update_fields=["stripe_onboarding_token"])
-
-        account_link = stripe.AccountLink.create(
-            account=establishment.stripe_account_id,
-            refresh_url=f"{DOMAIN}/api/stripe/connect/refresh?state={establishment.stripe_onboarding_token}",
-            return_url=f"{DOMAIN}/api/stripe/connect/return?state={establishment.stripe_onboarding_token}",
-            type="account_onboarding",
-        )
+        account_link = stripe_gateway.create_account_link(stripe_connect.account_link_params(establishment))
 
         return Response({"url": account_link["url"], "connected": False}, status=status.HTTP_200_OK)
 
@@ -373,14 +435,8 @@ class StripeConnectRefresh(APIView):
     def get(self, request):
         token = request.query_params.get("state")
         establishment = get_object_or_404(Establishment, stripe_onboarding_token=token)
-        
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        account_link = stripe.AccountLink.create(
-            account=establishment.stripe_account_id,
-            refresh_url=f"{DOMAIN}/api/stripe/connect/refresh?state={establishment.stripe_onboarding_token}",
-            return_url=f"{DOMAIN}/api/stripe/connect/return?state={establishment.stripe_onboarding_token}",
-            type="account_onboarding",
-        )
+
+        account_link = stripe_gateway.create_account_link(stripe_connect.account_link_params(establishment))
 
         return redirect(account_link['url'])
 
@@ -391,24 +447,14 @@ class StripeConnectReturn(APIView):
         token = request.query_params.get("state")
         establishment = get_object_or_404(Establishment, stripe_onboarding_token=token)
 
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        account = stripe.Account.retrieve(establishment.stripe_account_id)
+        account = stripe_gateway.retrieve_account(establishment.stripe_account_id)
 
         print("requirements.currently_due:", account["requirements"]["currently_due"])
         print("requirements.past_due:", account["requirements"]["past_due"])
         print("requirements.pending_verification:", account["requirements"]["pending_verification"])
         print("disabled_reason:", account.get("requirements", {}).get("disabled_reason"))
 
-        establishment.stripe_charges_enabled = bool(account["charges_enabled"])
-        establishment.stripe_payouts_enabled = bool(account["payouts_enabled"])
-        establishment.stripe_details_submitted = bool(account["details_submitted"])
-        establishment.stripe_onboarding_token = None
-        establishment.save(update_fields=[
-            "stripe_charges_enabled",
-            "stripe_payouts_enabled",
-            "stripe_details_submitted",
-            "stripe_onboarding_token",
-        ])
+        stripe_connect.apply_account(establishment, account)
 
         return redirect("api_rest:success_connect_stripe")
 
@@ -484,50 +530,45 @@ class AuthPasswordResetConfirm(APIView):
 
         return Response({"message": "Senha Atualizada com Sucesso"})
         
+# GET /api/stripe/status (polled by the front end: send If-None-Match/If-Modified-Since to get a 304)
 class StripeCheckStatusIntegration(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        establishment = get_object_or_404(Establishment, owner=user)
-        
-        if not establishment.stripe_details_submitted:
-            return Response(
-                {
-                "status": "Desconetcado",
-                "connected": False,
-                "observation": "Você não está conectado a stripe, para se conectar clique no botão abaixo e preencha os dados",
-                },
-                status=status.HTTP_200_OK,
-                )
-        
-        elif not (establishment.stripe_charges_enabled and establishment.stripe_payouts_enabled):
-            return Response(
-                {
-                "status": "Pendente",
-                "connected": False,
-                "observation": "Sua integração está pendente de confirmação, esse periodo pode levar de 24 a 48 horas",
-                },
-                status=status.HTTP_200_OK,
-             )
-        else:
-            return Response(
-                {
-                "status": "Conectado",
-                "connected": True,
-                "observation": "Sua conta está integrada a Strie",
-                },
-             status=status.HTTP_200_OK,
-             )
+        establishment = get_user_establishment(request.user)
+        integration = stripe_status.integration_status(establishment)
+
+        cached = not_modified(request, integration["etag"], integration["updated_at"])
+        if cached is not None:
+            return cached
+
+        response = Response(integration["body"], status=status.HTTP_200_OK)
+        return set_validators(response, integration["etag"], integration["updated_at"])
 
 class StripeTotalPayments(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         user = request.user
-        payments_ammount = UserPayment.objects.filter(establishment__owner=user, has_paid=True).aggregate(total=Sum("price"))
-        print(payments_ammount)
-        if payments_ammount["total"] is None:
+        # Read from the running totals the webhook maintains instead of summing UserPayment
+        payments_ammount = owner_total(user)
+        if not payments_ammount:
             return Response({"total": 0}, status=status.HTTP_200_OK)
         else:
-             return Response(payments_ammount, status=status.HTTP_200_OK)
+             return Response({"total": payments_ammount}, status=status.HTTP_200_OK)
+
+# GET /api/dashboard/daily-summary/?date=YYYY-MM-DD&period=day|week|month
+class DashboardSummary(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = DashboardSummaryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        day = serializer.validated_data.get("date") or timezone.localdate()
+        period = serializer.validated_data["period"]
+        start, end = period_range(day, period)
+
+        # Served from the AppointmentDailySummary rollup, never from the appointments table
+        summary = summarize(request.user, start, end)
+        return Response({"period": period, **summary}, status=status.HTTP_200_OK)
@@ -1,15 +1,16 @@
+import json
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from .models import UserPayment, Appointment, Establishment
-from django.shortcuts import get_object_or_404
+from .services.stripe_events import record_event, process_event
 
-@csrf_exempt
-def stripe_webhook(request):
+def verify_event(request):
+    """(payload, event) of a signed Stripe delivery, or None when the payload or signature is invalid."""
     payload = request.body.decode('utf-8')
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
-    event = None
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
     try:
         event = stripe.Webhook.construct_event(
@@ -18,40 +19,37 @@ def stripe_webhook(request):
         secret=settings.STRIPE_WEBHOOK_SECRET,
     )
         
-    except stripe.error.SignatureVerificationError as e:
-        # Invalid signature
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        # Invalid payload or signature
         print("Erro de assinatura")
+        return None
+
+    return payload, event
+
+def store_event(payload, event):
+    with transaction.atomic():
+        # Stripe retries deliveries, an event id we already stored is acknowledged without any write
+        stripe_event, created = record_event(event["id"], event["type"], json.loads(payload))
+
+        # In deferred mode the process_stripe_events worker applies the event
+        if created and not settings.STRIPE_WEBHOOK_DEFER:
+            process_event(stripe_event.pk)
+
+@csrf_exempt
+def stripe_webhook(request):
+    verified = verify_event(request)
+    if verified is None:
         return HttpResponse(status=400)
-    
-    # Verify if event is type checkout.session.completed
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        session_id = session["id"]
-        
-        payment = UserPayment.objects.filter(stripe_checkout_id=session_id).first()
-        appointment = Appointment.objects.filter(pk=payment.appointment.id).first()
-        
-        if payment:
-            payment.has_paid=True
-            payment.save(update_fields=["has_paid"])
-
-            appointment.status = 'CONFIRMED'
-            appointment.save(update_fields=["status"])
-    
-    # Verify if event is update account
-    elif event["type"] == "account.updated":
-        account = event["data"]["object"] # Get event information
-        establishment = get_object_or_404(Establishment, stripe_account_id=account["id"]) # Get establishment by stripe_account_id 
-
-        establishment.stripe_charges_enabled = bool(account["charges_enabled"])
-        establishment.stripe_payouts_enabled = bool(account["payouts_enabled"])
-        establishment.stripe_details_submitted = bool(account["details_submitted"])
-        establishment.save(update_fields=[
-            "stripe_charges_enabled",
-            "stripe_payouts_enabled",
-            "stripe_details_submitted",
-        ])
 
+    store_event(*verified)
     return HttpResponse(status=200)
 
+# Served by project/urls_async.py under ASGI: the transaction runs in the sync thread
+@csrf_exempt
+async def astripe_webhook(request):
+    verified = verify_event(request)
+    if verified is None:
+        return HttpResponse(status=400)
 
+    await sync_to_async(store_event)(*verified)
+    return HttpResponse(status=200)
@@ -0,0 +1,92 @@
+"""
+Gunicorn settings (scripts/runserver.sh runs: gunicorn -c gunicorn.conf.py).
+
+Everything is read from the environment so one image fits any box:
+
+    GUNICORN_WORKER_CLASS   gthread | sync | uvicorn (project.asgi, async Stripe views); defaults to
+                            uvicorn when SERVER_INTERFACE=asgi, gthread otherwise
+    WEB_CONCURRENCY         worker processes; default 2 x CPUs + 1 for gthread/sync, CPUs for uvicorn,
+                            capped by GUNICORN_MAX_WORKERS (8)
+    GUNICORN_THREADS        threads per gthread worker (4)
+    GUNICORN_PRELOAD        "1" imports Django once in the master and forks, so the workers share
+                            those pages copy-on-write (default "1")
+    GUNICORN_TIMEOUT        seconds a silent worker may run before it is killed (60)
+    GUNICORN_GRACEFUL_TIMEOUT  seconds workers get to finish requests on reload/shutdown (30)
+    GUNICORN_MAX_REQUESTS   recycle a worker after this many requests, 0 disables (1000),
+                            spread by GUNICORN_MAX_REQUESTS_JITTER (100) so they do not restart together
+
+python manage.py loadtest --profiles ... compares the throughput of these setups.
+"""
+import os
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn.workers.UvicornWorker",
+}
+
+
+def _int(name, default):
+    return int(os.getenv(name) or default)
+
+
+def cpu_count():
+    # CPUs this process may run on (respects taskset/cpuset), not the host's
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not Linux
+        return os.cpu_count() or 1
+
+
+def default_workers(kind, cpus):
+    # Async workers multiplex connections on one loop: one per CPU is enough. Blocking
+    # workers wait on Postgres and Stripe, so they get the classic 2 x CPUs + 1
+    return cpus if kind == "uvicorn" else 2 * cpus + 1
+
+
+kind = os.getenv("GUNICORN_WORKER_CLASS") or ("uvicorn" if os.getenv("SERVER_INTERFACE") == "asgi" else "gthread")
+if kind not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {kind!r}")
+
+wsgi_app = "project.asgi:application" if kind == "uvicorn" else "project.wsgi:application"
+worker_class = WORKER_CLASSES[kind]
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+workers = _int("WEB_CONCURRENCY", min(default_workers(kind, cpu_count()), _int("GUNICORN_MAX_WORKERS", 8)))
+threads = _int("GUNICORN_THREADS", 4) if kind == "gthread" else 1
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Above the worst blocking Stripe call: 3 attempts of STRIPE_READ_TIMEOUT plus backoff
+timeout = _int("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+
+max_requests = _int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+# Heartbeat files on tmpfs: a container's overlay filesystem can stall the workers' notify()
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def when_ready(server):
+    server.log.info("Serving %s with %s x %s worker(s), %s thread(s) each, preload=%s",
+                    wsgi_app, workers, kind, threads, preload_app)
+
+
+def post_fork(server, worker):
+    # With preload_app the master imported the project; nothing it opened may be shared by the
+    # forked workers: drop database connections and the Stripe client (its sessions and threads)
+    if not preload_app:
+        return
+
+    from django.db import connections
+
+    from api_rest.services import stripe_gateway
+
+    connections.close_all()
+    stripe_gateway.reset()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+# Route the Stripe-bound endpoints to their async views (api_rest/async_views.py)
+os.environ.setdefault('ROOT_URLCONF', 'project.urls_async')
 
 application = get_asgi_application()
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -107,6 +108,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  
     ],
+    # orjson-backed JSON, identical output to DRF's stdlib renderer (which it falls back to)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api_rest.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api_rest.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 MIDDLEWARE = [
@@ -127,7 +138,8 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.1.0",
 }
 
-ROOT_URLCONF = 'project.urls'
+# project/asgi.py switches to project.urls_async (async views for the Stripe-bound endpoints)
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'project.urls')
 
 TEMPLATES = [
     {
@@ -158,10 +170,60 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'change-me'),
         'HOST': os.getenv('POSTGRES_HOST', 'change-me'),
         'PORT': os.getenv('POSTGRES_PORT', 'change-me'),
+        # Test a reused connection (SELECT 1) before the request that picks it up,
+        # so a Postgres restart costs a reconnect instead of a 500
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
 
+# Connection reuse (DB_POOL_MODE):
+#   persistent  each worker thread keeps its connection for DB_CONN_MAX_AGE seconds
+#   pool        psycopg 3 pool shared by the threads of a worker, DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE
+#               connections; the one to use with ASGI, where persistent connections leak
+#   pgbouncer   persistent connections to a pgbouncer in transaction mode, which cannot
+#               keep the server-side cursors of .iterator() open between transactions
+#   none        a new connection (and authentication) per request
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'persistent')
+
+if DB_POOL_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 4)),
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+elif DB_POOL_MODE in ('persistent', 'pgbouncer'):
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = DB_POOL_MODE == 'pgbouncer'
+elif DB_POOL_MODE != 'none':
+    raise ImproperlyConfigured(f"DB_POOL_MODE must be persistent, pool, pgbouncer or none, not {DB_POOL_MODE!r}")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# and CACHE_LOCATION=redis://redis:6379/0 to share it between workers.
+# Local memory is per process: with more than one gunicorn worker (WEB_CONCURRENCY > 1,
+# the default on any box) a write only invalidates the cache of the worker that made it,
+# and the others keep serving what they cached until it expires: the establishments of a
+# user for 15 minutes, the Stripe integration status for 1 hour and the free slots of a
+# day for SLOTS_CACHE_TIMEOUT. Use a shared backend whenever more than one worker runs.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# Seconds the free slots of an establishment-day stay cached. Every booking invalidates
+# them, but only in a shared cache: with local memory a stale entry could show a booked
+# slot as free in the other workers, so it only lives 2 minutes there instead of a day
+SLOTS_CACHE_TIMEOUT = int(os.getenv('SLOTS_CACHE_TIMEOUT') or (
+    120 if CACHES['default']['BACKEND'].endswith('LocMemCache') else 60 * 60 * 24))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -213,18 +275,46 @@ MEDIA_ROOT = DATA_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Used as end_at when an appointment is booked with only start_at
+APPOINTMENT_DEFAULT_DURATION_MINUTES = int(os.getenv("APPOINTMENT_DEFAULT_DURATION_MINUTES", 60))
+
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+# When "1" the webhook only records the event and python manage.py process_stripe_events applies it
+STRIPE_WEBHOOK_DEFER = os.getenv("STRIPE_WEBHOOK_DEFER", "0") == "1"
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", 5))
+# Outbound Stripe API calls (api_rest/services/stripe_gateway.py); STRIPE_API_BASE points tests at a fake server
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE") or None
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", 3))
+STRIPE_READ_TIMEOUT = float(os.getenv("STRIPE_READ_TIMEOUT", 10))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", 2))
+STRIPE_CIRCUIT_THRESHOLD = int(os.getenv("STRIPE_CIRCUIT_THRESHOLD", 5))
+STRIPE_CIRCUIT_RESET_SECONDS = float(os.getenv("STRIPE_CIRCUIT_RESET_SECONDS", 30))
+# Async views without httpx installed run the Stripe calls in this many threads
+STRIPE_ASYNC_FALLBACK_THREADS = int(os.getenv("STRIPE_ASYNC_FALLBACK_THREADS", 64))
+# When "1" checkout answers 202 and python manage.py process_checkout_sessions creates the session
+STRIPE_CHECKOUT_ASYNC = os.getenv("STRIPE_CHECKOUT_ASYNC", "0") == "1"
+STRIPE_CHECKOUT_MAX_ATTEMPTS = int(os.getenv("STRIPE_CHECKOUT_MAX_ATTEMPTS", 5))
+# Upper bound of ?wait= on the checkout status endpoint (long polling) under ASGI, where the
+# wait yields the event loop; the WSGI view sleeps in a worker thread, so it waits much less
+STRIPE_CHECKOUT_MAX_WAIT = int(os.getenv("STRIPE_CHECKOUT_MAX_WAIT", 20))
+STRIPE_CHECKOUT_MAX_WAIT_SYNC = int(os.getenv("STRIPE_CHECKOUT_MAX_WAIT_SYNC", 2))
 
 
 # Settings e-mail
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", 30))
+
+# Outbox worker (python manage.py send_queued_emails)
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30))
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600))
 
 AXES_ENABLED = True
 AXES_FAILURE_LIMIT = 4
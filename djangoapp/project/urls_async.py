@@ -0,0 +1,17 @@
+"""
+URL configuration served by project/asgi.py.
+
+Same routes as project/urls.py, except that the Stripe-bound endpoints and the
+Stripe webhook resolve to the async views of api_rest/async_views.py first.
+"""
+from django.urls import path, include
+from api_rest.webhooks import astripe_webhook
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+
+urlpatterns = [
+    path('api/', include('api_rest.async_urls')),
+    path("stripe/webhook/", astripe_webhook, name="stripe-webhook-async"),
+    *wsgi_urlpatterns,
+]
@@ -2,8 +2,6 @@
 set -e
 # python manage.py runserver 0.0.0.0:8000
 
-gunicorn project.wsgi:application \
-    --bind 0.0.0.0:8000\
-    --workers 2 \
-    --threads 2 \
-    --timeout 120
\ No newline at end of file
+# Sizing, worker class (gthread, sync or uvicorn for SERVER_INTERFACE=asgi) and preload
+# come from the environment, see djangoapp/gunicorn.conf.py
+exec gunicorn -c gunicorn.conf.py